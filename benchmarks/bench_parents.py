@@ -0,0 +1,77 @@
+# Compare the time taken to track parents with an explicit stack
+# against the recursive traversal it replaced
+import ast
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from sully import ParentTransformer
+
+# The recursive traversal previously used by ParentTransformer
+class RecursiveParentTransformer(ParentTransformer):
+    def visit(self, node, parent=None):
+        if not isinstance(node, ast.AST):
+            return
+
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for item in value:
+                    self.visit(item, node)
+            else:
+                self.visit(value, node)
+
+        self._track(node, parent)
+        return node
+
+# Produce the source of a function with the given number of statements
+def make_source(statements):
+    lines = ['def foo(self, tainted):']
+    for i in range(statements):
+        lines.append('    if x%d:' % i)
+        lines.append('        x%d = self.a[%d] + tainted.bar(x%d, %d) * 3' %
+                     (i, i, max(i - 1, 0), i))
+    return '\n'.join(lines) + '\n'
+
+# Get the best time to track parents over a number of runs
+def run(transformer, source, runs):
+    best = None
+    for _ in range(runs):
+        tree = ast.parse(source)
+
+        # Collect trees from previous runs and keep the collector out
+        # of the timing since it depends on everything else in the heap
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.time()
+            transformer.visit(tree)
+            elapsed = time.time() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def main():
+    for statements in (1000, 5000):
+        source = make_source(statements)
+        nodes = sum(1 for _ in ast.walk(ast.parse(source)))
+        recursive = run(RecursiveParentTransformer(), source, 5)
+        iterative = run(ParentTransformer(), source, 5)
+        print('%6d nodes  recursive %.3fs  iterative %.3fs  (%.2fx)' %
+              (nodes, recursive, iterative, recursive / iterative))
+
+    # Chains of operators nest one level deeper for each operand
+    source = ' + '.join(['x'] * 20000)
+    try:
+        RecursiveParentTransformer().visit(ast.parse(source))
+        print('recursive handled a chain of 20000 operands')
+    except RuntimeError:
+        print('recursive exceeded the recursion limit')
+    ParentTransformer().visit(ast.parse(source))
+    print('iterative handled a chain of 20000 operands')
+
+if __name__ == '__main__':
+    main()
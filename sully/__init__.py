@@ -1,7 +1,12 @@
 import ast
-from collections import defaultdict
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, OrderedDict
+import hashlib
 import inspect
-import itertools
+import os
+
+__version__ = '0.0.1'
 
 # Get the source code of a function
 def get_func_source(func):
@@ -25,6 +30,60 @@ def get_func_ast(func):
     source = get_func_source(func)
     return ast.parse(source).body[0].body
 
+# A bounded mapping which discards the least recently used entries
+class LRUCache(object):
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+        # Counters which can be used to size the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Look up a value and mark it as the most recently used
+    def get(self, key, default=None):
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    # Store a value, evicting the oldest entries if we are over capacity
+    def put(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Drop all entries and reset the counters
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
 # Get all the ancestors of the current node
 def _ancestors(self):
     # Start with the current parent and no ancestors
@@ -45,84 +104,567 @@ class ParentTransformer(ast.NodeTransformer):
         if not isinstance(node, ast.AST):
             return
 
-        # Recursively visit children
-        for _, value in ast.iter_fields(node):
-            if isinstance(value, list):
-                for item in value:
-                    self.visit(item, node)
-            else:
-                self.visit(value, node)
+        # Collect all the nodes with an explicit stack so deeply nested
+        # trees cannot exceed the recursion limit. Children are pushed in
+        # order so the reverse of this visits children before parents.
+        # Parallel lists are used since tuples would add work for the
+        # garbage collector on large trees.
+        nodes = []
+        parents = []
+        stack = [node]
+        stack_parents = [parent]
+        push = stack.append
+        push_parent = stack_parents.append
+        AST = ast.AST
+        while stack:
+            current = stack.pop()
+            nodes.append(current)
+            parents.append(stack_parents.pop())
+
+            for field in current._fields:
+                value = getattr(current, field, None)
+                if isinstance(value, AST):
+                    push(value)
+                    push_parent(current)
+                elif isinstance(value, list):
+                    for child in value:
+                        if isinstance(child, AST):
+                            push(child)
+                            push_parent(current)
+
+        track = self._track
+        for i in range(len(nodes) - 1, -1, -1):
+            track(nodes[i], parents[i])
+
+        return node
 
+    # Record the parent of a node whose children have all been tracked
+    def _track(self, node, parent):
         # Assign the parent and ancestors method and return the node
         node.parent = parent
 
         # Keep track of the maximum and minimum line number
-        if not node.parent:
+        if not parent:
             if 'lineno' in node._attributes:
                 node.maxlineno = node.lineno
                 node.minlineno = node.lineno
             else:
                 node.maxlineno = None
                 node.minlineno = None
-        if node.parent and 'lineno' in node._attributes:
-            if hasattr(node.parent, 'maxlineno'):
-                node.parent.maxlineno = max(node.lineno, node.parent.maxlineno)
-            else:
-                node.parent.maxlineno = node.lineno
+        elif 'lineno' in node._attributes:
+            lineno = node.lineno
 
-            if hasattr(node.parent, 'minlineno'):
-                node.parent.minlineno = min(node.lineno, node.parent.minlineno)
-            else:
-                node.parent.minlineno = node.lineno
+            maxlineno = getattr(parent, 'maxlineno', None)
+            if maxlineno is None or lineno > maxlineno:
+                parent.maxlineno = lineno
 
-        node.ancestors = _ancestors.__get__(node, ast.AST)
-        return node
+            minlineno = getattr(parent, 'minlineno', None)
+            if minlineno is None or lineno < minlineno:
+                parent.minlineno = lineno
 
-# Traverse the AST to identify reads and writes to values
-class TaintAnalysis(ast.NodeVisitor):
-    def __init__(self, func_or_ast, taint_obj=None):
-        # If we were given a function, save it
-        if not isinstance(func_or_ast, ast.AST):
-            self.func = func_or_ast
+        node.ancestors = _ancestors.__get__(node, ast.AST)
 
-            # Get the source code of the function and parse the AST
-            source = get_func_source(self.func)
-            func_ast = ast.parse(source)
+        # Children are tracked first so their fingerprints are ready
+        node.fingerprint = _fingerprint(node)
+
+# Compute the structural fingerprint of a node from those of its children
+def _fingerprint(node):
+    parts = [node.__class__.__name__]
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, ast.AST):
+            parts.append(value.fingerprint)
+        elif isinstance(value, list):
+            parts.append(tuple(item.fingerprint
+                               if isinstance(item, ast.AST) else item
+                               for item in value))
         else:
-            func_ast = func_or_ast
-            self.func = None
-
-        if taint_obj is not None:
-            self.taint_obj = ast.parse(taint_obj).body[0].value
+            parts.append(value)
+
+    return hash(tuple(parts))
+
+# Get a hash of the structure of a node which is equal for any nodes
+# which are equal, computing it for any nodes in the tree without one
+def node_fingerprint(node):
+    fingerprint = getattr(node, 'fingerprint', None)
+    if fingerprint is not None:
+        return fingerprint
+
+    # Fingerprint children before their parents without recursing
+    stack = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if children_done:
+            current.fingerprint = _fingerprint(current)
+        elif not hasattr(current, 'fingerprint'):
+            stack.append((current, True))
+            for child in ast.iter_child_nodes(current):
+                stack.append((child, False))
+
+    return node.fingerprint
+
+# Nodes such as contexts and operators are shared between all trees
+# so they have no single parent and are left out of node tables
+_SHARED_NODES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop,
+                 ast.cmpop)
+
+# The parent, depth and range of lines of every node in a tree kept in
+# parallel arrays instead of as attributes on the nodes themselves
+class NodeTable(object):
+    def __init__(self, root):
+        self.root = root
+        self.nodes = []
+        self._indexes = {}
+
+        # Zero is used for a missing parent, depth or line number
+        # since indexes into the arrays are stored starting from one
+        self.parents = array('i')
+        self.depths = array('i')
+        self.minlinenos = array('i')
+        self.maxlinenos = array('i')
+
+        # Add nodes parents first so the parent index is always known
+        stack = [(root, 0)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(self.nodes) + 1
+            self.nodes.append(node)
+            self._indexes[id(node)] = index
+            self.parents.append(parent)
+            self.depths.append(self.depths[parent - 1] + 1 if parent else 0)
+            self.minlinenos.append(0)
+            self.maxlinenos.append(0)
+
+            children = [child for child in ast.iter_child_nodes(node)
+                        if not isinstance(child, _SHARED_NODES)]
+            for child in children:
+                stack.append((child, index))
+
+            # The root covers only its own line and any other node
+            # covers the lines of its direct children
+            if parent:
+                linenos = [child.lineno for child in children
+                           if 'lineno' in child._attributes]
+            elif 'lineno' in node._attributes:
+                linenos = [node.lineno]
+            else:
+                linenos = []
+
+            if linenos:
+                self.minlinenos[index - 1] = min(linenos)
+                self.maxlinenos[index - 1] = max(linenos)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return id(node) in self._indexes
+
+    def _index(self, node):
+        return self._indexes[id(node)] - 1
+
+    # Get the parent of a node or None for the root
+    def parent(self, node):
+        parent = self.parents[self._index(node)]
+        return self.nodes[parent - 1] if parent else None
+
+    # Get the number of ancestors of a node
+    def depth(self, node):
+        return self.depths[self._index(node)]
+
+    # Get the first and last line of a node or None if it has no lines
+    def span(self, node):
+        index = self._index(node)
+        return (self.minlinenos[index] or None,
+                self.maxlinenos[index] or None)
+
+    def minlineno(self, node):
+        return self.minlinenos[self._index(node)] or None
+
+    def maxlineno(self, node):
+        return self.maxlinenos[self._index(node)] or None
+
+    # Iterate over the ancestors of a node starting from its parent
+    def ancestors(self, node):
+        parent = self.parents[self._index(node)]
+        while parent:
+            yield self.nodes[parent - 1]
+            parent = self.parents[parent - 1]
+
+# Produce an integer with the given bits set
+def bits_of(numbers):
+    bits = 0
+    for number in numbers:
+        bits |= 1 << number
+    return bits
+
+# Get the positions of the set bits in increasing order
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+# Map values to dense integer ids so sets of values can be kept as bits
+class Interner(object):
+    def __init__(self, objs=()):
+        self.ids = {}
+        self.objs = []
+        for obj in objs:
+            self.intern(obj)
+
+    def __contains__(self, obj):
+        return obj in self.ids
+
+    def __iter__(self):
+        return iter(self.objs)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __getitem__(self, id_):
+        return self.objs[id_]
+
+    # Get the id of a value, assigning the next one if it has none
+    def intern(self, obj):
+        try:
+            return self.ids[obj]
+        except KeyError:
+            id_ = self.ids[obj] = len(self.objs)
+            self.objs.append(obj)
+            return id_
+
+    # Get the id of a value or None if it has none
+    def get(self, obj):
+        return self.ids.get(obj)
+
+    # Get the values whose ids are set in some bits
+    def objs_of(self, bits):
+        objs = self.objs
+        return [objs[id_] for id_ in iter_bits(bits)]
+
+# The line numbers for each value in a mapping of line sets so we can
+# check for lines in a range without looking at every line
+# Each value is given an id and its lines are kept as bits starting at
+# its first line so ranges are checked with a shift and a mask
+# The ids of values are only found when a value is first looked up so
+# indexes which are only iterated over stay small
+class LineIndex(object):
+    __slots__ = ('objs', '_bases', '_bits', '_ids')
+
+    def __init__(self, lines):
+        objs = []
+        self._bases = array('i')
+        self._bits = []
+        for obj, linenos in lines.items():
+            if linenos:
+                base = min(linenos)
+                objs.append(obj)
+                self._bases.append(base)
+                self._bits.append(bits_of(lineno - base
+                                          for lineno in linenos))
+
+        self.objs = tuple(objs)
+        self._ids = None
+
+    def __getstate__(self):
+        return (self.objs, self._bases.tolist(), self._bits)
+
+    def __setstate__(self, state):
+        self.objs, bases, self._bits = state
+        self._bases = array('i', bases)
+        self._ids = None
+
+    # Get the id of a value or None if it has no lines
+    def _id(self, obj):
+        if self._ids is None:
+            self._ids = dict((obj, id_) for id_, obj in enumerate(self.objs))
+        return self._ids.get(obj)
+
+    # The line sets the index was built from, produced on each use
+    @property
+    def lines(self):
+        return dict(self.items())
+
+    # Produce each value with a set of its line numbers
+    def items(self):
+        for id_, obj in enumerate(self.objs):
+            base = self._bases[id_]
+            yield obj, set(base + bit for bit in iter_bits(self._bits[id_]))
+
+    def __contains__(self, obj):
+        return self._id(obj) is not None
+
+    def __iter__(self):
+        return iter(self.objs)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __eq__(self, other):
+        return isinstance(other, LineIndex) and self.lines == other.lines
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Get the sorted line numbers for a value
+    def linenos(self, obj):
+        id_ = self._id(obj)
+        if id_ is None:
+            return []
+
+        base = self._bases[id_]
+        return [base + bit for bit in iter_bits(self._bits[id_])]
+
+    # Check if the value with an id has any lines within a range
+    def _id_in_range(self, id_, minlineno, maxlineno):
+        base = self._bases[id_]
+        bits = self._bits[id_]
+        if minlineno and minlineno > base:
+            bits >>= minlineno - base
+            base = minlineno
+
+        if not maxlineno:
+            return bits != 0
+        elif maxlineno < base:
+            return False
         else:
-            self.taint_obj = None
+            return bits & ((2 << (maxlineno - base)) - 1) != 0
+
+    # Check if a value has any lines within a range where
+    # a missing bound matches all lines
+    def any_in_range(self, obj, minlineno=None, maxlineno=None):
+        id_ = self._id(obj)
+        return id_ is not None and \
+            self._id_in_range(id_, minlineno, maxlineno)
+
+    # Check if a value has any lines before the given line
+    def any_before(self, obj, lineno):
+        id_ = self._id(obj)
+        return id_ is not None and self._bases[id_] < lineno
+
+    # Check if a value has any lines after the given line
+    def any_after(self, obj, lineno):
+        id_ = self._id(obj)
+        return id_ is not None and \
+            self._bases[id_] + self._bits[id_].bit_length() - 1 > lineno
+
+    # Get all values with lines in a given range
+    def in_range(self, minlineno=None, maxlineno=None):
+        return set(obj for id_, obj in enumerate(self.objs)
+                   if self._id_in_range(id_, minlineno, maxlineno))
+
+# Indexes over the line sets of an analysis which are built when first used
+# Note that they do not reflect changes made to the line sets afterwards
+class LineIndexed(object):
+    __slots__ = ()
+
+    def _line_index(self, name):
+        indexes = getattr(self, '_indexes', None)
+        if indexes is None:
+            indexes = self._indexes = {}
+
+        try:
+            return indexes[name]
+        except KeyError:
+            index = indexes[name] = LineIndex(getattr(self, name))
+            return index
+
+    @property
+    def read_index(self):
+        return self._line_index('read_lines')
+
+    @property
+    def write_index(self):
+        return self._line_index('write_lines')
+
+    @property
+    def function_index(self):
+        return self._line_index('functions')
+
+    # Get all functions called in this range
+    def functions_in_range(self, minlineno=None, maxlineno=None):
+        return self.function_index.in_range(minlineno, maxlineno)
+
+# The nodes where taint was introduced and the steps it took to reach
+# each other tainted node so only one edge is stored for each step
+# Indexing by a node gives the nodes where its taint was introduced
+class Provenance(object):
+    def __init__(self):
+        self.origins = []
+        self._origins = set()
+        self.edges = defaultdict(list)
+
+    def __contains__(self, node):
+        return node in self.edges or node in self._origins
+
+    def __len__(self):
+        return len(self._origins.union(self.edges))
+
+    def __getitem__(self, node):
+        return [other for other in self._reachable(node)
+                if other in self._origins]
+
+    # Record a node which introduces taint
+    def add_origin(self, node):
+        if node not in self._origins:
+            self._origins.add(node)
+            self.origins.append(node)
+
+    # Record that taint flowed from one node to another
+    def add_edge(self, source, target):
+        self.edges[target].append(source)
+
+    # Produce the nodes taint flowed through to reach a node
+    # starting with the node itself
+    def _reachable(self, node):
+        seen = set([node])
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            for source in reversed(self.edges.get(node, ())):
+                if source not in seen:
+                    seen.add(source)
+                    stack.append(source)
+
+    # Get the nodes taint flowed through from where it was introduced to
+    # a node, from the given origin if any, or None if there is no path
+    def path(self, node, origin=None):
+        previous = {node: None}
+        queue = [node]
+        for current in queue:
+            if current in self._origins and \
+                    (origin is None or current is origin):
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = previous[current]
+                return path
+
+            for source in self.edges.get(current, ()):
+                if source not in previous:
+                    previous[source] = current
+                    queue.append(source)
+
+        return None
+
+# Traverse the AST to identify reads and writes to values
+# If node_table is set, parents and line numbers are kept in a NodeTable
+# instead of on the nodes so the analysis holds no reference cycles.
+# The analysis can be limited to some of the passes in PASSES so callers
+# only pay for the information they use.
+class TaintAnalysis(ast.NodeVisitor, LineIndexed):
+    # reads        values read in read_lines
+    # writes       values written in write_lines
+    # calls        functions called in functions
+    # taint        expressions derived from taint_obj in taint_exprs
+    # provenance   where taint came from and how it spread in tainted_by
+    # interprocedural  reads, writes and calls of helper methods
+    PASSES = frozenset(['reads', 'writes', 'calls', 'taint', 'provenance',
+                        'interprocedural'])
+
+    # The passes each method records information for
+    _RECORD_PASSES = {
+        'record_Assign': ('writes', 'taint'),
+        'record_Compare': ('taint',),
+        'record_UnaryOp': ('taint',),
+        'record_BoolOp': ('taint',),
+        'record_BinOp': ('taint',),
+        'record_Attribute': ('reads',),
+        'record_Name': ('reads',),
+    }
+
+    # Looks up the summary of a method called on self given its class and
+    # name, where None uses the shared summaries from helper_summary
+    helpers = None
+
+    def __init__(self, func_or_ast, taint_obj=None, node_table=False,
+                 passes=None, helpers=None):
         super(TaintAnalysis, self).__init__()
+        self.helpers = helpers
+        self.func, func_ast = self._parse(func_or_ast)
+        self.taint_obj = self._parse_taint_obj(taint_obj)
+        self.passes = self._check_passes(passes)
+        self._enable(self.passes)
 
         # Initialize lists to track usage
         self.read_lines = defaultdict(set)
         self.write_lines = defaultdict(set)
         self.taint_exprs = set()
-        self.tainted_by = defaultdict(list)
+        self.tainted_by = Provenance()
         self.functions = defaultdict(set)
 
-        # Start visiting the root of the function's AST
-        self.func_ast = ParentTransformer().visit(func_ast)
-        self.visit(self.func_ast)
-
-    # Get all functions called in this range
-    def functions_in_range(self, minlineno=None, maxlineno=None):
-        functions = set()
-        for function, linenos in self.functions.iteritems():
-            for lineno in linenos:
-                if (not minlineno or lineno >= minlineno) and \
-                   (not maxlineno or lineno <= maxlineno):
-                    functions.add(function)
-                    break
-
-            if function in functions:
-                continue
+        # Methods called on self as (name, lineno, argument names)
+        self.helper_calls = []
 
-        return functions
+        # Start visiting the root of the function's AST
+        self.func_ast = func_ast
+        if node_table:
+            self.node_table = NodeTable(func_ast)
+            self._visit_tree(func_ast)
+        else:
+            # Parents are tracked in the same pass as the analysis
+            self.node_table = None
+            self._visit_tree(func_ast, ParentTransformer())
+
+    # Get the function (if we were given one) and its AST
+    @staticmethod
+    def _parse(func_or_ast):
+        if isinstance(func_or_ast, ast.AST):
+            return None, func_or_ast
+
+        # Get the source code of the function and parse the AST
+        return func_or_ast, ast.parse(get_func_source(func_or_ast))
+
+    @staticmethod
+    def _parse_taint_obj(taint_obj):
+        if taint_obj is None:
+            return None
+
+        taint_obj = ast.parse(taint_obj).body[0].value
+        node_fingerprint(taint_obj)
+        return taint_obj
+
+    # Get the passes to run from those requested
+    def _check_passes(self, passes):
+        if passes is None:
+            passes = self.PASSES
+        else:
+            passes = frozenset(passes)
+            if not passes <= self.PASSES:
+                raise ValueError('Unknown passes: ' +
+                                 ', '.join(sorted(passes - self.PASSES)))
+
+        # There is nothing to propagate without a source of taint
+        if self.taint_obj is None:
+            passes = passes - frozenset(['taint', 'provenance'])
+        elif 'taint' not in passes:
+            passes = passes - frozenset(['provenance'])
+
+        return passes
+
+    # Set the passes which are run when visiting nodes
+    def _enable(self, passes):
+        self._running = passes
+        self._reads = 'reads' in passes
+        self._writes = 'writes' in passes
+        self._calls = 'calls' in passes
+        self._taint = 'taint' in passes
+        self._provenance = 'provenance' in passes
+        self._interprocedural = 'interprocedural' in passes
+
+    # Chains between the reads and writes of values in the function
+    # which are built when first used and kept with the analysis
+    @property
+    def def_use(self):
+        chains = self.__dict__.get('_def_use')
+        if chains is None:
+            from sully.cfg import get_cfg
+            from sully.dataflow import DefUseChains
+            chains = self._def_use = DefUseChains(get_cfg(self.func_ast),
+                                                  self.func)
+        return chains
 
     # Get the identifier to use when recording a read/write
     def get_id(self, node):
@@ -135,8 +677,7 @@ class TaintAnalysis(ast.NodeVisitor):
             if node.value.id == 'self' or node.attr.isupper():
                 return (node.value.id, node.attr)
             else:
-                print(ast.dump(node))
-                raise Exception()
+                raise Exception('Unsupported attribute: ' + ast.dump(node))
         elif isinstance(node, ast.Subscript):
             # Record array writes as a write to the whole array
             return self.get_id(node.value)
@@ -144,175 +685,563 @@ class TaintAnalysis(ast.NodeVisitor):
             # We only need to track this to propagate
             return node
         else:
-            # XXX Debugging for things we don't support
-            print(ast.dump(node))
-            print(node._fields)
-            raise Exception()
+            # XXX Things we don't support
+            raise Exception('Unsupported node: ' + ast.dump(node))
 
     # Check ant propagate taint if necessary
     def check_add_taint(self, source, target):
         if source and source in self.taint_exprs:
-            self.tainted_by[target].extend(self.tainted_by[source][:])
+            if self._provenance:
+                self.tainted_by.add_edge(source, target)
             self.taint_exprs.add(target)
 
-    # Initialize the taint information and then visit the node
+    # Analyze the tree below a node
     def visit(self, node):
-        super(TaintAnalysis, self).visit(node)
+        self._visit_tree(node)
+
+    # Visit a tree with an explicit stack, recording each analyzed node
+    # after its children. If given a ParentTransformer, parents are
+    # tracked in the same pass in the same order ParentTransformer uses.
+    def _visit_tree(self, root, parents=None):
+        dispatch = self._dispatch(self._running)
+
+        # Leaves with nothing to record for the passes we are running
+        # are only needed for tracking parents
+        prune = parents is None
+
+        # Collect nodes parents first, noting whether each node is one
+        # the analysis looks at since some children are skipped
+        nodes = []
+        node_parents = []
+        analyzed = []
+        stack = [root]
+        stack_parents = [None]
+        stack_analyzed = [True]
+        while stack:
+            node = stack.pop()
+            node_analyzed = stack_analyzed.pop()
+            nodes.append(node)
+            node_parents.append(stack_parents.pop())
+            analyzed.append(node_analyzed)
+
+            for field, child_analyzed in _child_fields(node, node_analyzed):
+                # Skipped children are only needed for tracking parents
+                if not child_analyzed and parents is None:
+                    continue
+
+                value = getattr(node, field, None)
+                if isinstance(value, ast.AST):
+                    if prune and isinstance(value, _LEAF_TYPES) and \
+                            value.__class__ not in dispatch:
+                        continue
+                    stack.append(value)
+                    stack_parents.append(node)
+                    stack_analyzed.append(child_analyzed)
+                elif isinstance(value, list):
+                    for child in value:
+                        if isinstance(child, ast.AST):
+                            if prune and isinstance(child, _LEAF_TYPES) and \
+                                    child.__class__ not in dispatch:
+                                continue
+                            stack.append(child)
+                            stack_parents.append(node)
+                            stack_analyzed.append(child_analyzed)
+
+        # Children come before their parents in reverse
+        for i in range(len(nodes) - 1, -1, -1):
+            node = nodes[i]
+            if parents is not None:
+                parents._track(node, node_parents[i])
+
+            if analyzed[i]:
+                record = dispatch.get(node.__class__)
+                if record is not None:
+                    record(self, node)
+
+    # Map each type of node to the method which records it, leaving out
+    # methods which record nothing for the passes we are running. This is
+    # built once for each class so it includes methods of subclasses.
+    @classmethod
+    def _dispatch(cls, passes=PASSES):
+        tables = cls.__dict__.get('_dispatch_tables')
+        if tables is None:
+            tables = cls._dispatch_tables = {}
+
+        dispatch = tables.get(passes)
+        if dispatch is None:
+            dispatch = tables[passes] = {}
+            for name in dir(cls):
+                # Nodes used to be analyzed by visit_* methods which are
+                # no longer called so refuse to silently skip them
+                # Methods of NodeVisitor itself such as visit_Constant
+                # on Python 3.8+ are not ours to reject
+                if name.startswith('visit_') and \
+                        isinstance(getattr(ast, name[len('visit_'):], None),
+                                   type) and \
+                        any(name in vars(klass) for klass in cls.__mro__
+                            if issubclass(klass, TaintAnalysis)):
+                    del tables[passes]
+                    raise TypeError('%s.%s is not called, define %s '
+                                    'instead' % (cls.__name__, name,
+                                                 'record_' +
+                                                 name[len('visit_'):]))
+
+                if not name.startswith('record_'):
+                    continue
+
+                # Methods we don't know about always run
+                record_passes = cls._RECORD_PASSES.get(name)
+                if record_passes is not None and \
+                        not passes.intersection(record_passes):
+                    continue
+
+                node_type = getattr(ast, name[len('record_'):], None)
+                if node_type is not None:
+                    method = getattr(cls, name)
+                    dispatch[node_type] = getattr(method, '__func__', method)
+
+        return dispatch
 
     # Record a write to a given value
-    def visit_Assign(self, node):
-        self.visit(node.value)
-
+    def record_Assign(self, node):
         for target in node.targets:
-            self.write_lines[self.get_id(target)].add(node.lineno)
-            self.check_add_taint(node.value, target)
+            if self._writes:
+                self.write_lines[self.get_id(target)].add(node.lineno)
+            if self._taint:
+                self.check_add_taint(node.value, target)
 
     # Copy the taint for comparison operators
-    def visit_Compare(self, node):
+    def record_Compare(self, node):
         # XXX We only handle a single comparison
         if len(node.ops) != 1 or len(node.comparators) != 1:
-            raise Exception()
+            raise Exception('Unsupported comparison: ' + ast.dump(node))
 
-        self.visit(node.left)
         self.check_add_taint(node.left, node)
-
-        self.visit(node.comparators[0])
         self.check_add_taint(node.comparators[0], node)
 
     # Copy the taint for unary operators
-    def visit_UnaryOp(self, node):
-        self.visit(node.operand)
+    def record_UnaryOp(self, node):
         self.check_add_taint(node.operand, node)
 
     # Copy the taint for boolean operators
-    def visit_BoolOp(self, node):
+    def record_BoolOp(self, node):
         for value in node.values:
-            self.visit(value)
             self.check_add_taint(value, node)
 
-
     # Copy the taint for binary operators
-    def visit_BinOp(self, node):
-        self.visit(node.left)
+    def record_BinOp(self, node):
         self.check_add_taint(node.left, node)
-
-        self.visit(node.right)
         self.check_add_taint(node.right, node)
 
     # Record a read of an attribute on some value
-    def visit_Attribute(self, node):
+    def record_Attribute(self, node):
         var = (self.get_id(node.value), node.attr)
         self.read_lines[var].add(node.lineno)
 
-        self.visit(node.value)
-
     # Record a read of a simple variable
-    def visit_Name(self, node):
+    def record_Name(self, node):
         # This ignores parameter names and references to self since
         # we will capture these when we visit Attribute nodes
         if isinstance(node.ctx, ast.Load) and node.id != 'self':
             self.read_lines[node.id].add(node.lineno)
 
     # Record reads and writes from functions called within our function
-    def visit_Call(self, node):
+    def record_Call(self, node):
         if isinstance(node.func, ast.Attribute):
-            # Continue down the tree if we have multiple attribute lookups
-            if not isinstance(node.func.value, ast.Name):
-                self.visit(node.func)
-
             # Track this function call
-            if isinstance(node.func, ast.Attribute) and \
-               isinstance(node.func.value, ast.Name):
+            if self._calls and isinstance(node.func.value, ast.Name):
                 func_id = (node.func.value.id, node.func.attr)
                 self.functions[func_id].add(node.lineno)
 
             # Assume function calls on objects modify data
-            self.write_lines[self.get_id(node.func.value)].add(node.lineno)
+            if self._writes:
+                self.write_lines[self.get_id(node.func.value)].add(
+                        node.lineno)
 
             # Record this node as one which introduces taint
-            if nodes_equal(node.func.value, self.taint_obj):
+            if self._taint and nodes_equal(node.func.value, self.taint_obj):
                 self.taint_exprs.add(node)
+                if self._provenance:
+                    self.tainted_by.add_origin(node)
 
             # Check for functions on ourself
             # Note that this doesn't currently work when used
             # as a decorator since im_class will not be set
-            if isinstance(node.func.value, ast.Name) and \
+            # unless a lookup for summaries of helpers is given
+            if self._interprocedural and \
+                    isinstance(node.func.value, ast.Name) and \
                     node.func.value.id == 'self' and \
-                    hasattr(self.func, 'im_class'):
-                other_func = getattr(self.func.im_class, node.func.attr)
-                other_args = inspect.getargspec(other_func).args[1:]
-                ta = TaintAnalysis(other_func)
-
-                # Copy functions used by the other function
-                for func_id in ta.functions.iterkeys():
-                    self.functions[func_id].add(node.lineno)
-
-                # Check arguments which were read written
-                # Note that we're being pessimistic for writes here since
-                # assignments just "write" to the local variable for parameter
-                # XXX Doesn't work for functions with starargs or kwargs
-                for i, arg in enumerate(node.args):
-                    if isinstance(arg, ast.Name):
-                        arg_name = other_args[i]
-                        if ta.read_lines.has_key(arg_name):
-                            self.read_lines[arg.id].add(node.lineno)
-                        if ta.write_lines.has_key(arg_name):
-                            self.write_lines[arg.id].add(node.lineno)
-
-                # Copy over attribute nodes which were read or written
-                for var, _ in ta.read_lines.items():
-                    if isinstance(var, tuple):
-                        self.read_lines[var].add(node.lineno)
-
-                for var, _ in ta.write_lines.items():
-                    if isinstance(var, tuple):
-                        self.write_lines[var].add(node.lineno)
-
-        # Visit function parameters to record reads
-        for arg in node.args:
-            self.visit(arg)
-            self.check_add_taint(arg, node)
-        if node.starargs:
-            self.visit(node.starargs)
-            self.check_add_taint(node.starargs, node)
-        if node.kwargs:
-            self.visit(node.kwargs)
-            self.check_add_taint(node.kwargs, node)
+                    (self.helpers is not None or
+                     hasattr(self.func, 'im_class')):
+                self.record_helper(node)
+
+        # Propagate taint from the function parameters
+        if self._taint:
+            for arg in node.args:
+                self.check_add_taint(arg, node)
+            if getattr(node, 'starargs', None):
+                self.check_add_taint(node.starargs, node)
+            if getattr(node, 'kwargs', None):
+                self.check_add_taint(node.kwargs, node)
+
+    # Record the reads, writes and calls of a method called on `self`
+    # A lookup for helpers may give no summary for methods it can't find
+    def record_helper(self, node):
+        # XXX Doesn't work for functions with starargs or kwargs
+        arg_ids = [arg.id if isinstance(arg, ast.Name) else None
+                   for arg in node.args]
+        self.helper_calls.append((node.func.attr, node.lineno, arg_ids))
+
+        summary = (self.helpers or helper_summary)(
+            getattr(self.func, 'im_class', None), node.func.attr)
+        if summary is None:
+            return
+
+        add_helper(summary, node.lineno, arg_ids,
+                   self.read_lines if self._reads else None,
+                   self.write_lines if self._writes else None,
+                   self.functions if self._calls else None)
+
+# Add the reads, writes and calls of a helper method called on a line
+# with the given names as positional arguments to those of the caller
+# Any of the caller's results which are not being recorded may be None
+def add_helper(summary, lineno, arg_ids, read_lines, write_lines,
+               functions):
+    other_args = summary.args[1:]
+
+    # Copy functions used by the other function
+    if functions is not None:
+        for func_id in summary.function_index:
+            functions.setdefault(func_id, set()).add(lineno)
+
+    # Check arguments which were read written
+    # Note that we're being pessimistic for writes here since
+    # assignments just "write" to the local variable for parameter
+    for i, arg_id in enumerate(arg_ids):
+        if arg_id is not None:
+            arg_name = other_args[i]
+            if read_lines is not None and arg_name in summary.read_index:
+                read_lines.setdefault(arg_id, set()).add(lineno)
+            if write_lines is not None and \
+                    arg_name in summary.write_index:
+                write_lines.setdefault(arg_id, set()).add(lineno)
+
+    # Copy over attribute nodes which were read or written
+    if read_lines is not None:
+        for var in summary.read_index:
+            if isinstance(var, tuple):
+                read_lines.setdefault(var, set()).add(lineno)
+
+    if write_lines is not None:
+        for var in summary.write_index:
+            if isinstance(var, tuple):
+                write_lines.setdefault(var, set()).add(lineno)
+
+# The fields of nodes whose values are analyzed for each type of node
+# The function called is only analyzed if it is a chain of attributes
+_ANALYZED_FIELDS = {
+    ast.Assign: ('value',),
+    ast.Compare: ('left', 'comparators'),
+    ast.UnaryOp: ('operand',),
+    ast.BoolOp: ('values',),
+    ast.BinOp: ('left', 'right'),
+    ast.Attribute: ('value',),
+    ast.Name: (),
+    ast.Call: ('args', 'starargs', 'kwargs'),
+}
+
+# Nodes which have no children other than contexts and operators so
+# they need not be visited unless something is recorded for them
+_LEAF_TYPES = tuple(getattr(ast, name) for name in (
+    'expr_context', 'operator', 'unaryop', 'cmpop', 'boolop', 'Name',
+    'Num', 'Str', 'Bytes', 'NameConstant', 'Constant')
+    if hasattr(ast, name))
+
+# Fields which never contain nodes so we can skip looking at them
+_SCALAR_FIELDS = {
+    ast.Name: ('id',),
+    ast.Attribute: ('attr',),
+    ast.FunctionDef: ('name',),
+    ast.ClassDef: ('name',),
+    ast.keyword: ('arg',),
+    ast.alias: ('name', 'asname'),
+    ast.ImportFrom: ('module', 'level'),
+    ast.Global: ('names',),
+}
+if hasattr(ast, 'Num'):
+    _SCALAR_FIELDS[ast.Num] = ('n',)
+    _SCALAR_FIELDS[ast.Str] = ('s',)
+
+# The fields which may contain children for each type of node, paired
+# with whether the children are analyzed, for nodes which are analyzed,
+# for nodes which are not, and for calls whose function is analyzed
+_analyzed_child_fields = {}
+_skipped_child_fields = {}
+_call_child_fields = {}
+
+# Get the fields of a node which may contain children paired with
+# whether the analysis looks at those children
+def _child_fields(node, node_analyzed):
+    node_type = node.__class__
+    if not node_analyzed:
+        cache = _skipped_child_fields
+    elif node_type is ast.Call and \
+            isinstance(node.func, ast.Attribute) and \
+            not isinstance(node.func.value, ast.Name):
+        cache = _call_child_fields
+    else:
+        cache = _analyzed_child_fields
+
+    try:
+        return cache[node_type]
+    except KeyError:
+        pass
+
+    scalar_fields = _SCALAR_FIELDS.get(node_type, ())
+    if cache is _skipped_child_fields:
+        analyzed_fields = ()
+    else:
+        analyzed_fields = _ANALYZED_FIELDS.get(node_type, node._fields)
+
+        # Continue down the tree if we have multiple attribute lookups
+        if cache is _call_child_fields:
+            analyzed_fields = ('func',) + analyzed_fields
+
+    fields = cache[node_type] = tuple(
+        (field, field in analyzed_fields) for field in node._fields
+        if field not in scalar_fields)
+    return fields
+
+# An attribute computed by a method the first time it is accessed
+# and then stored on the instance in place of the descriptor
+class _lazy(object):
+    def __init__(self, compute):
+        self.compute = compute
+        self.__name__ = compute.__name__
+        self.__doc__ = compute.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+
+        value = obj.__dict__[self.__name__] = self.compute(obj)
+        return value
+
+# A TaintAnalysis which does nothing until its results are used
+# Each result runs only the passes it depends on the first time it is
+# accessed so results which are never used are never computed
+class LazyTaintAnalysis(TaintAnalysis):
+    # The passes each result depends on
+    _RESULT_PASSES = OrderedDict([
+        ('read_lines', frozenset(['reads', 'interprocedural'])),
+        ('write_lines', frozenset(['writes', 'interprocedural'])),
+        ('functions', frozenset(['calls', 'interprocedural'])),
+        ('taint_exprs', frozenset(['taint'])),
+        ('tainted_by', frozenset(['taint', 'provenance'])),
+    ])
+
+    def __init__(self, func_or_ast, taint_obj=None, node_table=False,
+                 passes=None, helpers=None):
+        self.helpers = helpers
+        self._func_or_ast = func_or_ast
+        self._taint_source = taint_obj
+        self._use_node_table = node_table
+        self._requested_passes = passes
+
+    def _load(self):
+        self.func, func_ast = self._parse(self._func_or_ast)
+
+        # Without a node table, parents are expected on the nodes
+        if not self._use_node_table:
+            ParentTransformer().visit(func_ast)
+        return func_ast
+
+    @_lazy
+    def func(self):
+        self.func_ast = self._load()
+        return self.func
+
+    @_lazy
+    def func_ast(self):
+        return self._load()
+
+    @_lazy
+    def taint_obj(self):
+        return self._parse_taint_obj(self._taint_source)
+
+    @_lazy
+    def passes(self):
+        return self._check_passes(self._requested_passes)
+
+    @_lazy
+    def node_table(self):
+        if self._use_node_table:
+            return NodeTable(self.func_ast)
+
+    # Run the passes needed for one result, keeping any other results
+    # which those passes compute completely
+    def _compute(self, name):
+        passes = self.passes
+        running = passes.intersection(self._RESULT_PASSES[name])
+        func_ast = self.func_ast
+
+        # Results computed earlier are set aside so they aren't added to
+        computed = {}
+        for result in self._RESULT_PASSES:
+            if result in self.__dict__:
+                computed[result] = self.__dict__[result]
+        self.read_lines = defaultdict(set)
+        self.write_lines = defaultdict(set)
+        self.taint_exprs = set()
+        self.tainted_by = Provenance()
+        self.functions = defaultdict(set)
+        self.helper_calls = []
+
+        self._enable(running)
+        try:
+            self._visit_tree(func_ast)
+        except Exception:
+            # Partial results are dropped so they are not memoized
+            for result in self._RESULT_PASSES:
+                if result in computed:
+                    self.__dict__[result] = computed[result]
+                else:
+                    del self.__dict__[result]
+            raise
+
+        for result, result_passes in self._RESULT_PASSES.items():
+            if result in computed:
+                self.__dict__[result] = computed[result]
+            elif not running.issuperset(passes & result_passes):
+                del self.__dict__[result]
+
+        return self.__dict__[name]
+
+    @_lazy
+    def read_lines(self):
+        return self._compute('read_lines')
+
+    @_lazy
+    def write_lines(self):
+        return self._compute('write_lines')
+
+    @_lazy
+    def functions(self):
+        return self._compute('functions')
+
+    @_lazy
+    def taint_exprs(self):
+        return self._compute('taint_exprs')
+
+    @_lazy
+    def tainted_by(self):
+        return self._compute('tainted_by')
+
+# Check if an identifier can be used without the AST it was found in
+def _is_portable(obj):
+    if isinstance(obj, tuple):
+        return all(_is_portable(part) for part in obj)
+    return not isinstance(obj, ast.AST)
+
+# Get the names of the arguments of the function in an AST
+def _arg_names(func_ast):
+    if isinstance(func_ast, ast.Module) and func_ast.body and \
+            isinstance(func_ast.body[0], ast.FunctionDef):
+        return [arg.id for arg in func_ast.body[0].args.args]
+    else:
+        return []
+
+# A compact record of the values a function reads and writes and the
+# functions it calls which can be kept without the AST it came from
+# Lines are only kept in indexes and the line sets are produced on use
+class Summary(object):
+    __slots__ = ('args', 'read_index', 'write_index', 'function_index')
+
+    def __init__(self, args, read_lines, write_lines, functions):
+        self.args = args
+        self.read_index = LineIndex(read_lines)
+        self.write_index = LineIndex(write_lines)
+        self.function_index = LineIndex(functions)
+
+    # Summarize an analysis, dropping identifiers which refer to AST nodes
+    @classmethod
+    def from_analysis(cls, taint):
+        def portable(lines):
+            return dict((obj, linenos) for obj, linenos in lines.items()
+                        if _is_portable(obj))
+
+        return cls(_arg_names(taint.func_ast), portable(taint.read_lines),
+                   portable(taint.write_lines), portable(taint.functions))
+
+    @property
+    def read_lines(self):
+        return self.read_index.lines
+
+    @property
+    def write_lines(self):
+        return self.write_index.lines
+
+    @property
+    def functions(self):
+        return self.function_index.lines
+
+    # Get all functions called in this range
+    def functions_in_range(self, minlineno=None, maxlineno=None):
+        return self.function_index.in_range(minlineno, maxlineno)
+
+    def __eq__(self, other):
+        return isinstance(other, Summary) and \
+            self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+        return (self.args, self.read_index, self.write_index,
+                self.function_index)
+
+    def __setstate__(self, state):
+        self.args, self.read_index, self.write_index, \
+            self.function_index = state
 
 # Check if two AST nodes are equal
 def nodes_equal(node1, node2):
     if node1 is None or node2 is None:
         return False
 
-    # Initialize iterators over both trees
-    walk1 = ast.walk(node1)
-    walk2 = ast.walk(node2)
+    # Compare pairs of values from both trees with an explicit stack so
+    # deeply nested expressions cannot exceed the recursion limit
+    stack = [(node1, node2)]
+    while stack:
+        value1, value2 = stack.pop()
 
-    for node1, node2 in itertools.izip(walk1, walk2):
-        # Check that there are the same number of fields
-        if len(node1._fields) != len(node2._fields):
-            return False
-
-        # Check that all field values are equal
-        for field1, field2 in itertools.izip(node1._fields, node2._fields):
-            if field1 != field2:
+        if isinstance(value1, ast.AST):
+            if type(value1) is not type(value2):
                 return False
 
-            # Get the field values from each node
-            value1 = getattr(node1, field1)
-            value2 = getattr(node2, field2)
+            # If both nodes have been fingerprinted we can quickly rule
+            # out most nodes which are not equal without comparing them
+            fingerprint1 = getattr(value1, 'fingerprint', None)
+            fingerprint2 = getattr(value2, 'fingerprint', None)
+            if fingerprint1 is not None and fingerprint2 is not None and \
+                    fingerprint1 != fingerprint2:
+                return False
 
-            # Recursively check all nodes
-            if isinstance(value1, ast.AST) and isinstance(value2, ast.AST):
-                if not nodes_equal(value1, value2):
-                    return False
-            elif value1 != value2:
+            for field in value1._fields:
+                stack.append((getattr(value1, field, None),
+                              getattr(value2, field, None)))
+        elif isinstance(value1, list):
+            if not isinstance(value2, list) or len(value1) != len(value2):
                 return False
+            stack.extend(zip(value1, value2))
+        elif isinstance(value2, (ast.AST, list)) or value1 != value2:
+            return False
 
     return True
 
 # Produce an AST which contains the necessary lines in the function
-def block_including(func_ast, minlineno, maxlineno):
+# using the lines recorded in a node table if one is given
+def block_including(func_ast, minlineno, maxlineno, table=None):
     if isinstance(func_ast, ast.Module):
         func_body = func_ast.body[0].body
     else:
@@ -320,9 +1249,14 @@ def block_including(func_ast, minlineno, maxlineno):
 
     body = []
     for node in func_body:
+        if table is None:
+            node_minlineno, node_maxlineno = node.minlineno, node.maxlineno
+        else:
+            node_minlineno, node_maxlineno = table.span(node)
+
         # If the two ranges overlap, save this node
-        minrange = max(node.minlineno, minlineno)
-        maxrange = min(node.maxlineno, maxlineno)
+        minrange = max(node_minlineno, minlineno)
+        maxrange = min(node_maxlineno, maxlineno)
 
         if maxrange >= minrange:
             body.append(node)
@@ -330,62 +1264,347 @@ def block_including(func_ast, minlineno, maxlineno):
     return body
 
 # Get the expressions which are read and written within a given block
-def block_inout(func_or_ast, minlineno, maxlineno):
-    taint = TaintAnalysis(func_or_ast)
-    arg_names = set([arg.id for arg in taint.func_ast.body[0].args.args])
-    
-    # Get all functions called in this range
-    functions = taint.functions_in_range(minlineno, maxlineno)
-    read_lines = taint.read_lines
-    write_lines = taint.write_lines
-    for function in functions:
-        if function[0] == 'self' and hasattr(func_or_ast, 'im_class'):
-            # Perform analysis on the other functions
-            other_func = getattr(func_or_ast.im_class, function[1])
-            other_taint = TaintAnalysis(other_func)
+def block_inout(func_or_ast, minlineno, maxlineno, precise=False):
+    return Analyzer(func_or_ast).block_inout(minlineno, maxlineno, precise)
+
+# Analyze a function once and answer questions about any number
+# of blocks within the function from the same analysis
+class Analyzer(object):
+    # The number of blocks checked at once which makes building
+    # matrices of the lines where each value is used worthwhile
+    MATRIX_RANGES = 32
+
+    def __init__(self, func_or_ast):
+        if isinstance(func_or_ast, ast.AST):
+            self.func = None
+            self._taint = TaintAnalysis(func_or_ast, node_table=True)
+            self.summary = Summary.from_analysis(self._taint)
+        else:
+            # The AST is only needed if we are asked for blocks
+            self.func = func_or_ast
+            self._taint = None
+            self.summary = summarize(func_or_ast)
+
+        self._helper_exprs = {}
+        self._index = None
+        self._matrix = None
+
+    # The full analysis of the function
+    @property
+    def taint(self):
+        if self._taint is None:
+            self._taint = analyze(self.func)
+        return self._taint
+
+    # Get the values read and written by a helper called in the function
+    def helper_exprs(self, function):
+        try:
+            return self._helper_exprs[function]
+        except KeyError:
+            pass
+
+        reads = set()
+        writes = set()
+        if function[0] == 'self' and hasattr(self.func, 'im_class'):
+            # Use the analysis of the other functions
+            other_summary = helper_summary(self.func.im_class, function[1])
 
             # Copy over expressions from the helper
-            for expr, _ in other_taint.read_lines.items():
+            for expr in other_summary.read_index:
                 if isinstance(expr, tuple):
-                    read_lines[expr].add(minlineno)
-            for expr, _ in other_taint.write_lines.items():
+                    reads.add(expr)
+            for expr in other_summary.write_index:
                 if isinstance(expr, tuple):
-                    write_lines[expr].add(minlineno)
-
-    in_exprs = set()
-    for obj, lines in taint.read_lines.iteritems():
-        # Check if any read happens within our range
-        in_range = any(lineno >= minlineno and lineno <= maxlineno
-                for lineno in lines)
-
-        # Check if this is a function local variable
-        is_local = not isinstance(obj, tuple)
-
-        # Check if there were any previous writes in the function to this value
-        written_before = any(lineno < minlineno
-                for lineno in taint.write_lines[obj])
-
-        # If in range and not a local used only in this block, include it
-        if in_range and (not is_local or written_before or obj in arg_names):
-            in_exprs.add(obj)
-
-    out_exprs = set()
-    for obj, lines in taint.write_lines.iteritems():
-        # Check if any write happens within our range
-        in_range = any(lineno >= minlineno and lineno <= maxlineno
-                for lineno in lines)
-
-        # Check if this is a function local variable
-        is_local = not isinstance(obj, tuple)
-
-        # Check if there are any future reads to this value
-        # XXX This doesn't account for the fact that this read may only
-        #     occur with an intervening write in which case we don't need this
-        reads_after = any(lineno > maxlineno
-                for lineno in taint.read_lines[obj])
-
-        # If in range and not a local variable never read again, include it
-        if in_range and (not is_local or reads_after):
-            out_exprs.add(obj)
-
-    return in_exprs, out_exprs
+                    writes.add(expr)
+
+        self._helper_exprs[function] = (reads, writes)
+        return reads, writes
+
+    # The control-flow graph of the function shared with other analyses
+    @property
+    def cfg(self):
+        from sully.cfg import get_cfg
+        return get_cfg(self.taint.func_ast)
+
+    # The lines where each value is read and written as matrices
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            from sully.matrix import UsageMatrix
+            self._matrix = UsageMatrix.from_summary(self.summary)
+        return self._matrix
+
+    # Produce the statements which contain the necessary lines
+    def block_including(self, minlineno, maxlineno):
+        return block_including(self.taint.func_ast, minlineno, maxlineno,
+                               self.taint.node_table)
+
+    # Get the expressions which are read and written within a given block
+    def block_inout(self, minlineno, maxlineno, precise=False):
+        return self.block_inouts([(minlineno, maxlineno)], precise)[0]
+
+    # Get the expressions read and written by each of a list of blocks
+    # given as (minlineno, maxlineno) pairs in a single pass over the
+    # lines of each block rather than over every value in the function
+    # If precise is set, local variables are only included if a value
+    # actually flows into or out of the block along the control flow
+    def block_inouts(self, ranges, precise=False):
+        if self._index is None:
+            self._index = _BlockIndex(self.summary)
+        index = self._index
+        arg_names = set(self.summary.args)
+
+        if precise:
+            from sully.dataflow import precise_block_inouts
+            inouts = precise_block_inouts(self.taint.def_use, ranges)
+
+        # Many blocks are checked at once with NumPy if it is available
+        elif len(ranges) >= self.MATRIX_RANGES and _has_numpy():
+            inouts = self.matrix.block_inouts(ranges)
+        else:
+            inouts = [self._block_inout(index, arg_names, minlineno,
+                                        maxlineno)
+                      for minlineno, maxlineno in ranges]
+
+        # Values used by helpers called in a range are used by the block
+        for (minlineno, maxlineno), (in_exprs, out_exprs) in zip(ranges,
+                                                                 inouts):
+            for function in index.calls_in_range(minlineno, maxlineno):
+                reads, writes = self.helper_exprs(function)
+                in_exprs.update(reads)
+                out_exprs.update(writes)
+
+        return inouts
+
+    # Get the values used directly in a block which flow into or out of it
+    @staticmethod
+    def _block_inout(index, arg_names, minlineno, maxlineno):
+        in_exprs = set()
+        out_exprs = set()
+        for obj in index.reads_in_range(minlineno, maxlineno):
+            # Check if this is a function local variable
+            is_local = not isinstance(obj, tuple)
+
+            # Check if there were any previous writes to this value
+            written_before = index.write_index.any_before(obj, minlineno)
+
+            # If not a local used only in this block, include it
+            if not is_local or written_before or obj in arg_names:
+                in_exprs.add(obj)
+
+        for obj in index.writes_in_range(minlineno, maxlineno):
+            # Check if this is a function local variable
+            is_local = not isinstance(obj, tuple)
+
+            # Check if there are any future reads to this value
+            # XXX This doesn't account for the fact that this read may
+            #     only occur with an intervening write in which case we
+            #     don't need this
+            reads_after = index.read_index.any_after(obj, maxlineno)
+
+            # If not a local variable never read again, include it
+            if not is_local or reads_after:
+                out_exprs.add(obj)
+
+        return in_exprs, out_exprs
+
+# Check if NumPy can be used for vectorized queries
+def _has_numpy():
+    from sully import matrix
+    return matrix.numpy is not None
+
+# The values read, written and called on each line of a function so
+# the values used in a block are found without checking every value
+class _BlockIndex(object):
+    def __init__(self, summary):
+        self.interner = Interner()
+        self.reads = self._by_line(summary.read_index)
+        self.writes = self._by_line(summary.write_index)
+        self.calls = self._by_line(summary.function_index)
+
+        # Check for uses before and after a block
+        self.read_index = summary.read_index
+        self.write_index = summary.write_index
+
+    # Produce sorted line numbers and the ids of the values used on
+    # each line as bits so the values used in a range are found by
+    # combining the bits of each line
+    def _by_line(self, index):
+        intern = self.interner.intern
+        bits_by_line = defaultdict(int)
+        for obj, linenos in index.items():
+            bit = 1 << intern(obj)
+            for lineno in linenos:
+                bits_by_line[lineno] |= bit
+
+        linenos = sorted(bits_by_line)
+        return linenos, [bits_by_line[lineno] for lineno in linenos]
+
+    # Get all values used on the lines within a range
+    def _in_range(self, by_line, minlineno, maxlineno):
+        linenos, line_bits = by_line
+        start = bisect_left(linenos, minlineno)
+        end = bisect_right(linenos, maxlineno)
+
+        bits = 0
+        for i in range(start, end):
+            bits |= line_bits[i]
+        return set(self.interner.objs_of(bits))
+
+    def reads_in_range(self, minlineno, maxlineno):
+        return self._in_range(self.reads, minlineno, maxlineno)
+
+    def writes_in_range(self, minlineno, maxlineno):
+        return self._in_range(self.writes, minlineno, maxlineno)
+
+    # Get all functions called in this range, where a missing
+    # bound matches all lines as in `functions_in_range`
+    def calls_in_range(self, minlineno, maxlineno):
+        linenos = self.calls[0]
+        if not linenos:
+            return set()
+
+        return self._in_range(self.calls, minlineno or linenos[0],
+                              maxlineno or linenos[-1])
+
+# Analyses shared between callers of `analyze`
+analysis_cache = LRUCache(maxsize=256)
+
+# Produce a key identifying a function by the content of its source
+# Helper methods are resolved through the class, so methods with the
+# same source on different classes can produce different results
+# The class itself is part of the key since classes may share a name
+def analysis_key(func, taint_obj=None):
+    source = get_func_source(func)
+    if not isinstance(source, bytes):
+        source = source.encode('utf-8')
+
+    digest = hashlib.sha1(source)
+    digest.update(('\0%s' % (taint_obj or '')).encode('utf-8'))
+    return (getattr(func, 'im_class', None), digest.hexdigest())
+
+# Produce a key for the persistent cache from a key given by analysis_key
+# Stored summaries leave out helper methods so they depend only on the
+# source of the function and not on its class
+def disk_key(key):
+    return hashlib.sha1(('local\0' + key[1]).encode('utf-8')).hexdigest()
+
+# Analyze a function, reusing any previous analysis of the same source
+# Note that the analysis returned is shared and must not be modified
+def analyze(func_or_ast, taint_obj=None):
+    # We have no source to hash for an AST so always analyze it
+    if isinstance(func_or_ast, ast.AST):
+        return TaintAnalysis(func_or_ast, taint_obj)
+
+    key = analysis_key(func_or_ast, taint_obj)
+    taint = analysis_cache.get(key)
+    if taint is None:
+        taint = TaintAnalysis(func_or_ast, taint_obj)
+        analysis_cache.put(key, taint)
+
+    return taint
+
+# Summaries shared between callers of `summarize`
+summary_cache = LRUCache(maxsize=1024)
+
+# The persistent cache is only used if a directory is configured
+# where _UNSET means set_cache_dir was never called
+_UNSET = object()
+_disk_cache = None
+_disk_cache_dir = _UNSET
+
+# Store summaries under the given directory, or disable the
+# persistent cache if the directory is None
+def set_cache_dir(directory):
+    global _disk_cache, _disk_cache_dir
+    if _disk_cache is not None:
+        _disk_cache.close()
+
+    _disk_cache = None
+    _disk_cache_dir = directory
+
+# Get the persistent cache, configured by `set_cache_dir` or
+# the SULLY_CACHE_DIR environment variable if it was never called
+def get_disk_cache():
+    global _disk_cache
+    directory = _disk_cache_dir
+    if directory is _UNSET:
+        directory = os.environ.get('SULLY_CACHE_DIR')
+    if not directory:
+        return None
+
+    if _disk_cache is None or _disk_cache.directory != directory:
+        if _disk_cache is not None:
+            _disk_cache.close()
+
+        from sully.diskcache import DiskCache
+        _disk_cache = DiskCache(directory, __version__)
+
+    return _disk_cache
+
+# Summarize a function, reusing a summary of the same source
+# from memory or from the persistent cache if one is configured
+def summarize(func_or_ast):
+    # The analysis is discarded so avoid leaving cycles for the collector
+    if isinstance(func_or_ast, ast.AST):
+        return Summary.from_analysis(TaintAnalysis(func_or_ast,
+                                                   node_table=True))
+
+    key = analysis_key(func_or_ast)
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    disk_cache = get_disk_cache()
+    if disk_cache is None:
+        summary = Summary.from_analysis(TaintAnalysis(func_or_ast,
+                                                      node_table=True))
+    else:
+        # Only the function's own results depend on the source in the
+        # key so helpers are stored as calls and added after loading
+        local = disk_cache.get(disk_key(key))
+        if local is None:
+            taint = TaintAnalysis(func_or_ast, node_table=True,
+                                  helpers=lambda cls, name: None)
+            local = (Summary.from_analysis(taint), taint.helper_calls)
+            disk_cache.put(disk_key(key), local)
+        summary = _add_helpers(key[0], *local)
+
+    summary_cache.put(key, summary)
+    return summary
+
+# Add the results of helper methods of a class to a summary of a
+# function produced without them
+def _add_helpers(cls, summary, helper_calls):
+    if cls is None or not helper_calls:
+        return summary
+
+    # Each of these is a new mapping so they can be added to
+    read_lines = summary.read_lines
+    write_lines = summary.write_lines
+    functions = summary.functions
+    for name, lineno, arg_ids in helper_calls:
+        add_helper(helper_summary(cls, name), lineno, arg_ids,
+                   read_lines, write_lines, functions)
+
+    return Summary(summary.args, read_lines, write_lines, functions)
+
+# Summaries of helper methods keyed by their class and function
+helper_cache = LRUCache(maxsize=1024)
+
+# Get the key for a method in helper_cache
+def helper_key(cls, name):
+    func = getattr(cls, name)
+    return (cls, getattr(func, '__func__', func))
+
+# Summarize a method called on `self` so each method of a class is
+# analyzed once regardless of how many places it is called from
+# Methods reachable from this one are summarized bottom-up so methods
+# which call each other are analyzed a bounded number of times
+def helper_summary(cls, name):
+    summary = helper_cache.get(helper_key(cls, name))
+    if summary is None:
+        from sully.callgraph import CallGraph
+        summary = CallGraph(cls, [name]).summarize()[(cls, name)]
+
+    return summary
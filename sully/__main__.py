@@ -0,0 +1,58 @@
+from __future__ import print_function
+
+import argparse
+import sys
+
+from sully.parallel import analyze_paths
+
+# Format an identifier recorded by the analysis as a dotted name
+def _format_id(obj):
+    if isinstance(obj, tuple):
+        return '.'.join(_format_id(part) for part in obj)
+    return str(obj)
+
+# Format the values used on each line as a sorted list
+def _format_lines(lines):
+    return ', '.join(sorted(_format_id(obj) for obj, linenos in lines.items()
+                            if linenos))
+
+# Print the reads, writes and calls of every function in the modules
+# at the given paths along with any errors
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='sully',
+        description='Summarize the values read and written by the '
+                    'functions in Python modules and packages')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help='a Python file or package directory')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='the number of processes to use, or 0 to '
+                             'use one for each CPU')
+    args = parser.parse_args(argv)
+
+    failed = False
+    modules = analyze_paths(args.paths, args.jobs or None)
+    for module, analysis in modules.items():
+        if analysis.error is not None:
+            print('%s: %s' % (module, analysis.error), file=sys.stderr)
+            failed = True
+            continue
+
+        for name, lineno in analysis.linenos.items():
+            if name in analysis.errors:
+                print('%s:%d: %s: %r' % (module, lineno, name,
+                                         analysis.errors[name]),
+                      file=sys.stderr)
+                failed = True
+                continue
+
+            summary = analysis.summaries[name]
+            print('%s:%d: %s' % (module, lineno, name))
+            print('  reads: ' + _format_lines(summary.read_lines))
+            print('  writes: ' + _format_lines(summary.write_lines))
+            print('  calls: ' + _format_lines(summary.functions))
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import inspect
+
+from sully import Summary, TaintAnalysis, analysis_key, helper_cache, \
+    helper_key, helper_summary, summarize, summary_cache
+
+# Check if a value on a class is a method we can analyze
+def _is_method(value):
+    return inspect.ismethod(value) or inspect.isfunction(value)
+
+# The methods of one or more classes and the methods each calls on self
+# Methods are (class, name) pairs and the graph contains every method
+# reachable from the methods it was built from
+class CallGraph(object):
+    def __init__(self, cls=None, names=None):
+        self.edges = {}
+        self.summaries = {}
+        self._calls = {}
+        if cls is not None:
+            self.add_class(cls, names)
+
+    @classmethod
+    def from_module(cls, module):
+        graph = cls()
+        for _, value in sorted(vars(module).items()):
+            if inspect.isclass(value) and \
+                    value.__module__ == module.__name__:
+                graph.add_class(value)
+        return graph
+
+    def __contains__(self, method):
+        return method in self.edges
+
+    def __iter__(self):
+        return iter(self.edges)
+
+    def __len__(self):
+        return len(self.edges)
+
+    # Add methods of a class, or all of its methods if no names
+    # are given, along with every method they call
+    def add_class(self, cls, names=None):
+        if names is None:
+            names = [name for name, value in inspect.getmembers(cls)
+                     if _is_method(value)]
+
+        self.add_methods([(cls, name) for name in names])
+
+    # Add methods along with every method they call
+    def add_methods(self, methods):
+        todo = list(methods)
+        while todo:
+            method = todo.pop()
+            if method in self.edges:
+                continue
+
+            # Only the calls made are needed to find the callees
+            calls = self._calls.get(method)
+            if calls is None:
+                calls = TaintAnalysis(self.function(method),
+                                      node_table=True, passes=['calls'])
+                self._calls[method] = calls
+
+            callees = []
+            for obj, attr in sorted(calls.functions):
+                if obj == 'self':
+                    callee = self.callee(method, attr)
+                    if callee is not None:
+                        callees.append(callee)
+            self.edges[method] = callees
+            todo.extend(callees)
+
+    # Get the function or tree to analyze for a method
+    def function(self, method):
+        return getattr(*method)
+
+    # Get the method called on self by another method or None
+    def callee(self, method, name):
+        cls = method[0]
+        if _is_method(getattr(cls, name, None)):
+            return (cls, name)
+
+    # Get a summary already made for a method or None
+    def cached(self, method):
+        key = helper_key(*method)
+        if key in helper_cache:
+            return helper_cache.get(key)
+
+    # Keep a summary so it can be shared with other analyses
+    def store(self, method, summary):
+        helper_cache.put(helper_key(*method), summary)
+        summary_cache.put(analysis_key(getattr(*method)), summary)
+
+    # Get a lookup for the summaries of methods called by a method
+    # which are being built by summarize
+    def helpers_for(self, method):
+        def helpers(cls, name):
+            summary = self.summaries.get((cls, name))
+            if summary is None:
+                summary = helper_summary(cls, name)
+            return summary
+        return helpers
+
+    # Summarize a method after the methods it calls outside of its
+    # component, where in_cycle is set if it calls itself directly or
+    # through others so the summaries of helpers may still change
+    def analyze(self, method, in_cycle=False):
+        func = self.function(method)
+        if not in_cycle:
+            return summarize(func)
+
+        return Summary.from_analysis(TaintAnalysis(
+            func, node_table=True, helpers=self.helpers_for(method)))
+
+    # Get the strongly connected components of the graph with Tarjan's
+    # algorithm using an explicit stack so long chains of calls cannot
+    # exceed the recursion limit
+    # Components come after every component they call
+    def sccs(self):
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        for root in sorted(self.edges, key=repr):
+            if root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.edges[root]))]
+            while work:
+                method, callees = work[-1]
+                for callee in callees:
+                    if callee not in index:
+                        index[callee] = low[callee] = len(index)
+                        stack.append(callee)
+                        on_stack.add(callee)
+                        work.append((callee, iter(self.edges[callee])))
+                        break
+                    elif callee in on_stack:
+                        low[method] = min(low[method], index[callee])
+                else:
+                    work.pop()
+                    if work:
+                        caller = work[-1][0]
+                        low[caller] = min(low[caller], low[method])
+
+                    if low[method] == index[method]:
+                        component = []
+                        while True:
+                            other = stack.pop()
+                            on_stack.discard(other)
+                            component.append(other)
+                            if other == method:
+                                break
+                        components.append(component)
+
+        return components
+
+    # Summarize every method so each method is summarized after the
+    # methods it calls and methods which call each other are analyzed
+    # together until their summaries stop changing
+    def summarize(self):
+        self.summaries = {}
+        for component in self.sccs():
+            pending = []
+            for method in component:
+                summary = self.cached(method)
+                if summary is not None:
+                    self.summaries[method] = summary
+                else:
+                    pending.append(method)
+
+            if pending:
+                self.summarize_component(pending)
+
+        return self.summaries
+
+    # Summarize the methods in a component which have no summary yet
+    def summarize_component(self, methods):
+        method = methods[0]
+        if len(methods) == 1 and method not in self.edges[method]:
+            self.summaries[method] = self.analyze(method)
+        else:
+            self._fixpoint(methods)
+
+        for method in methods:
+            self.store(method, self.summaries[method])
+
+    # Analyze methods which call each other starting from summaries with
+    # no reads or writes until the summaries stop changing
+    # Summaries only grow so this ends after a bounded number of rounds
+    def _fixpoint(self, methods):
+        summaries = self.summaries
+        for method in methods:
+            calls = Summary.from_analysis(self._calls[method])
+            summaries[method] = Summary(calls.args, {}, {}, {})
+
+        changed = True
+        while changed:
+            changed = False
+            for method in methods:
+                summary = self.analyze(method, in_cycle=True)
+                if summary != summaries[method]:
+                    summaries[method] = summary
+                    changed = True
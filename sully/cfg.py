@@ -0,0 +1,310 @@
+import ast
+
+from sully import LRUCache, analyze
+
+# A sequence of items in a function which always run one after another
+# Items are simple statements, the tests of branches and loops which
+# are evaluated at the end of a block, and For and With statements which
+# stand for assigning their targets
+class Block(object):
+    __slots__ = ('index', 'items', 'succs', 'preds')
+
+    def __init__(self, index):
+        self.index = index
+        self.items = []
+        self.succs = []
+        self.preds = []
+
+    def __repr__(self):
+        return '<Block %d -> %s>' % (self.index,
+                                     [succ.index for succ in self.succs])
+
+# A finally clause being built along with the jumps which pass through it
+# as (target, depth) pairs where depth is the number of enclosing finally
+# clauses at the target
+class _Finally(object):
+    __slots__ = ('entry', 'jumps')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.jumps = []
+
+# The control-flow graph of the body of a function
+# Blocks after a jump which are never reached have no predecessors
+# and are left out of reverse_postorder
+class CFG(object):
+    def __init__(self, func_ast):
+        self.func_ast = func_ast
+        self.blocks = []
+        self.entry = self._new_block()
+        self.exit = self._new_block()
+
+        # The continue and break targets of enclosing loops along with
+        # the number of finally clauses around each loop
+        self._loops = []
+        self._finally = []
+
+        # The blocks reached by exceptions raised within each enclosing
+        # try statement
+        self._raises = []
+
+        last = self._build(_func_body(func_ast), self.entry)
+        self._link(last, self.exit)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def _new_block(self):
+        block = Block(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    @staticmethod
+    def _link(block, succ):
+        if succ not in block.succs:
+            block.succs.append(succ)
+            succ.preds.append(block)
+
+    # Leave a block for a target, passing through any finally
+    # clauses which are not also around the target
+    def _jump(self, block, target, depth=0):
+        if len(self._finally) > depth:
+            final = self._finally[-1]
+            self._link(block, final.entry)
+            final.jumps.append((target, depth))
+        else:
+            self._link(block, target)
+
+        # Anything following a jump is unreachable
+        return self._new_block()
+
+    # Get the blocks reached by an exception raised at this point
+    def _raise_targets(self):
+        return self._raises[-1] if self._raises else [self.exit]
+
+    # Link a block to the handlers of an enclosing try statement since
+    # its items may raise an exception
+    def _may_raise(self, block):
+        if self._raises:
+            for target in self._raises[-1]:
+                self._link(block, target)
+
+    # End a block after an item which may raise an exception so the
+    # values at the point of the exception reach the handlers
+    def _split(self, block):
+        if not self._raises:
+            return block
+
+        self._may_raise(block)
+        after = self._new_block()
+        self._link(block, after)
+        return after
+
+    # Add a list of statements starting in a block
+    # and produce the block where control continues
+    def _build(self, stmts, block):
+        for stmt in stmts:
+            build = getattr(self, '_build_' + stmt.__class__.__name__, None)
+            if build is not None:
+                block = build(stmt, block)
+            else:
+                block.items.append(stmt)
+                block = self._split(block)
+
+        return block
+
+    def _build_If(self, stmt, block):
+        block.items.append(stmt.test)
+        self._may_raise(block)
+        after = self._new_block()
+
+        for body in (stmt.body, stmt.orelse):
+            start = self._new_block()
+            self._link(block, start)
+            self._link(self._build(body, start), after)
+
+        return after
+
+    # Loops have a header which is reached both before the first
+    # iteration and after each one and decides whether to continue
+    def _loop(self, header, stmt):
+        after = self._new_block()
+        body = self._new_block()
+        self._link(header, body)
+
+        self._loops.append((header, after, len(self._finally)))
+        self._link(self._build(stmt.body, body), header)
+        self._loops.pop()
+
+        # The else clause runs when the loop ends without a break
+        orelse = self._new_block()
+        self._link(header, orelse)
+        self._link(self._build(stmt.orelse, orelse), after)
+        return after
+
+    def _build_While(self, stmt, block):
+        header = self._new_block()
+        self._link(block, header)
+        header.items.append(stmt.test)
+        self._may_raise(header)
+        return self._loop(header, stmt)
+
+    def _build_For(self, stmt, block):
+        block.items.append(stmt.iter)
+        self._may_raise(block)
+        header = self._new_block()
+        self._link(block, header)
+        header.items.append(stmt)
+        self._may_raise(header)
+        return self._loop(header, stmt)
+
+    def _build_With(self, stmt, block):
+        block.items.append(stmt)
+        return self._build(stmt.body, self._split(block))
+
+    def _build_Break(self, stmt, block):
+        # XXX A break outside a loop is a syntax error we ignore
+        if not self._loops:
+            return block
+
+        _, after, depth = self._loops[-1]
+        return self._jump(block, after, depth)
+
+    def _build_Continue(self, stmt, block):
+        if not self._loops:
+            return block
+
+        header, _, depth = self._loops[-1]
+        return self._jump(block, header, depth)
+
+    def _build_Return(self, stmt, block):
+        block.items.append(stmt)
+        self._may_raise(block)
+        return self._jump(block, self.exit)
+
+    # Exceptions raised inside a try statement reach its handlers
+    # and finally clause rather than leaving the function
+    def _build_Raise(self, stmt, block):
+        block.items.append(stmt)
+        if not self._raises:
+            return self._jump(block, self.exit)
+
+        self._may_raise(block)
+        return self._new_block()
+
+    # Python 2 splits try statements with both handlers and a finally
+    # clause into a TryFinally whose body is a TryExcept
+    # Any item in the body may raise so each ends its block with edges
+    # to the handlers, and exceptions which are not handled or which are
+    # raised by the handlers or else clause go through the finally clause
+    # before leaving the try statement
+    def _build_Try(self, stmt, block):
+        after = self._new_block()
+        final = None
+        if getattr(stmt, 'finalbody', None):
+            final = _Finally(self._new_block())
+            self._finally.append(final)
+        join = final.entry if final else after
+        outer = self._raise_targets()
+
+        handlers = []
+        for handler in getattr(stmt, 'handlers', ()):
+            start = self._new_block()
+            if handler.type is not None:
+                start.items.append(handler.type)
+            handlers.append((handler, start))
+
+        targets = [start for _, start in handlers]
+        if final is not None:
+            targets.append(final.entry)
+        elif all(handler.type is not None for handler, _ in handlers):
+            targets.extend(outer)
+
+        # The body starts with an empty block so the values before the
+        # first item also reach the handlers
+        body = self._new_block()
+        self._link(block, body)
+        self._raises.append(targets)
+        self._may_raise(body)
+        start = self._new_block()
+        self._link(body, start)
+        end = self._build(stmt.body, start)
+        self._raises.pop()
+
+        if final is not None:
+            self._raises.append([final.entry])
+        end = self._build(getattr(stmt, 'orelse', ()), end)
+        self._link(end, join)
+
+        for handler, start in handlers:
+            self._link(self._build(handler.body, start), join)
+
+        if final is not None:
+            self._raises.pop()
+            self._finally.pop()
+            end = self._build(stmt.finalbody, final.entry)
+            self._link(end, after)
+
+            # Jumps out of the body continue after the finally clause
+            # as do exceptions which were not handled
+            for target, depth in final.jumps:
+                self._jump(end, target, depth)
+            for target in outer:
+                self._link(end, target)
+
+        return after
+
+    _build_TryExcept = _build_TryFinally = _build_Try
+
+# Get the statements in the body of a function given its AST
+def _func_body(func_ast):
+    if isinstance(func_ast, ast.Module) and len(func_ast.body) == 1 and \
+            isinstance(func_ast.body[0], ast.FunctionDef):
+        return func_ast.body[0].body
+    else:
+        return func_ast.body
+
+# Get the blocks of a graph in reverse postorder so each block comes
+# before its successors other than along back edges
+# Successors are explored last to first so the body of a loop comes
+# before the code following the loop
+def reverse_postorder(cfg):
+    order = []
+    seen = set([cfg.entry.index])
+    stack = [(cfg.entry, reversed(cfg.entry.succs))]
+    while stack:
+        block, succs = stack[-1]
+        for succ in succs:
+            if succ.index not in seen:
+                seen.add(succ.index)
+                stack.append((succ, reversed(succ.succs)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+
+    order.reverse()
+    return order
+
+# Graphs shared between analyses of the same tree
+cfg_cache = LRUCache(maxsize=256)
+
+# Get the graph of a function, reusing any graph already built for it
+# Functions use the tree of their shared analysis so every analysis of
+# a function refers to the same nodes
+# Note that the graph returned is shared and must not be modified
+def get_cfg(func_or_ast):
+    if isinstance(func_or_ast, ast.AST):
+        func_ast = func_or_ast
+    else:
+        func_ast = analyze(func_or_ast).func_ast
+
+    cfg = cfg_cache.get(func_ast)
+    if cfg is None:
+        cfg = CFG(func_ast)
+        cfg_cache.put(func_ast, cfg)
+
+    return cfg
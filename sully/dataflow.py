@@ -0,0 +1,583 @@
+import ast
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import heapq
+
+from sully import Interner, Provenance, TaintAnalysis, bits_of, iter_bits, \
+    nodes_equal, _arg_names, _is_portable
+from sully.cfg import get_cfg, reverse_postorder
+
+# Get the identifier for a value assigned to or None if it isn't tracked
+# Note that unlike TaintAnalysis.get_id this accepts any expression
+def target_id(node):
+    while isinstance(node, ast.Subscript):
+        node = node.value
+
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute) and \
+            isinstance(node.value, ast.Name):
+        return (node.value.id, node.attr)
+    else:
+        return None
+
+# The expressions directly within a statement, not counting those in
+# the bodies of compound statements
+def stmt_exprs(stmt):
+    for field in stmt._fields:
+        value = getattr(stmt, field, None)
+        if isinstance(value, ast.expr):
+            yield value
+        elif isinstance(value, list):
+            for child in value:
+                if isinstance(child, ast.expr):
+                    yield child
+
+# Propagate taint through the control-flow graph of a function until no
+# more values become tainted so taint carried around loops is found
+# Values are tainted by name so an expression reading a tainted variable
+# is tainted wherever the variable may hold a tainted value
+# The values tainted at each point are kept as bits of interned ids
+class TaintFixpoint(object):
+    def __init__(self, func_or_ast, taint_obj):
+        self.cfg = get_cfg(func_or_ast)
+        self.func_ast = self.cfg.func_ast
+        self.taint_obj = TaintAnalysis._parse_taint_obj(taint_obj)
+        self.values = Interner()
+
+        # The values tainted on entry to and exit from each block
+        self.block_in = [0] * len(self.cfg)
+        self.block_out = [0] * len(self.cfg)
+        self.taint_exprs = set()
+        self.visits = 0
+
+        self._solve()
+
+    # Get the values which may be tainted on entry to a block
+    def tainted_before(self, block):
+        return set(self.values.objs_of(self.block_in[block.index]))
+
+    # Get the values which may be tainted on exit from a block
+    def tainted_after(self, block):
+        return set(self.values.objs_of(self.block_out[block.index]))
+
+    # Visit blocks whose predecessors changed until nothing changes,
+    # taking blocks in reverse postorder so most are visited once
+    def _solve(self):
+        order = dict((block.index, i)
+                     for i, block in enumerate(reverse_postorder(self.cfg)))
+        blocks = self.cfg.blocks
+        worklist = [(i, index) for index, i in order.items()]
+        heapq.heapify(worklist)
+        queued = set(order)
+
+        while worklist:
+            _, index = heapq.heappop(worklist)
+            queued.discard(index)
+            block = blocks[index]
+            self.visits += 1
+
+            tainted = 0
+            for pred in block.preds:
+                tainted |= self.block_out[pred.index]
+            self.block_in[index] = tainted
+
+            for item in block.items:
+                tainted = self._transfer(item, tainted)
+
+            if tainted != self.block_out[index]:
+                self.block_out[index] = tainted
+                for succ in block.succs:
+                    if succ.index not in queued and succ.index in order:
+                        queued.add(succ.index)
+                        heapq.heappush(worklist, (order[succ.index],
+                                                  succ.index))
+
+    # Check if the value assigned to by a target is tainted
+    def _target_tainted(self, target, tainted):
+        id_ = self.values.get(target_id(target))
+        return id_ is not None and tainted >> id_ & 1
+
+    # Produce the tainted values after one item in a block
+    def _transfer(self, item, tainted):
+        if isinstance(item, ast.expr):
+            self._eval(item, tainted)
+        elif isinstance(item, ast.For):
+            tainted = self._assign(item.target, item.iter in self.taint_exprs,
+                                   tainted)
+        elif isinstance(item, ast.With):
+            # Python 3 has a list of items for each context manager
+            for with_item in getattr(item, 'items', [item]):
+                is_tainted = self._eval(with_item.context_expr, tainted)
+                if with_item.optional_vars is not None:
+                    tainted = self._assign(with_item.optional_vars,
+                                           is_tainted, tainted)
+        elif isinstance(item, ast.Assign):
+            is_tainted = self._eval(item.value, tainted)
+            for target in item.targets:
+                tainted = self._assign(target, is_tainted, tainted)
+        elif isinstance(item, ast.AugAssign):
+            is_tainted = self._eval(item.value, tainted) or \
+                self._target_tainted(item.target, tainted)
+            tainted = self._assign(item.target, is_tainted, tainted,
+                                   weak=True)
+        else:
+            for expr in stmt_exprs(item):
+                self._eval(expr, tainted)
+
+        return tainted
+
+    # Produce the tainted values after a value is assigned
+    # Only variables are replaced by an assignment since other values
+    # may be partly overwritten or refer to the same object as another
+    def _assign(self, target, is_tainted, tainted, weak=False):
+        if isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                tainted = self._assign(elt, is_tainted, tainted, weak)
+            return tainted
+        elif target.__class__.__name__ == 'Starred':
+            target = target.value
+
+        target_name = target_id(target)
+        if is_tainted:
+            self.taint_exprs.add(target)
+            if target_name is not None:
+                tainted |= 1 << self.values.intern(target_name)
+        elif not weak and isinstance(target, ast.Name):
+            id_ = self.values.get(target_name)
+            if id_ is not None:
+                tainted &= ~(1 << id_)
+
+        return tainted
+
+    # Find the tainted expressions within an expression and
+    # produce whether the expression itself is tainted
+    def _eval(self, expr, tainted):
+        # Collect expressions parents first and visit them in reverse
+        # so children are checked before their parents
+        nodes = []
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    stack.append(child)
+
+        taint_exprs = self.taint_exprs
+        for node in reversed(nodes):
+            if node in taint_exprs:
+                continue
+
+            if self._is_tainted(node, tainted):
+                taint_exprs.add(node)
+
+        return expr in taint_exprs
+
+    def _is_tainted(self, node, tainted):
+        taint_exprs = self.taint_exprs
+        if isinstance(node, (ast.Name, ast.Attribute)):
+            if self._target_tainted(node, tainted):
+                return True
+            return isinstance(node, ast.Attribute) and \
+                node.value in taint_exprs
+        elif isinstance(node, ast.Call):
+            # Calls on the object introduce taint
+            if isinstance(node.func, ast.Attribute) and \
+                    nodes_equal(node.func.value, self.taint_obj):
+                return True
+
+            args = node.args + [getattr(node, 'starargs', None),
+                                getattr(node, 'kwargs', None)]
+            return any(arg in taint_exprs for arg in args if arg is not None)
+        elif isinstance(node, (ast.BinOp, ast.BoolOp, ast.UnaryOp,
+                               ast.Compare, ast.Subscript, ast.Tuple,
+                               ast.List, ast.IfExp)):
+            return any(child in taint_exprs
+                       for child in ast.iter_child_nodes(node))
+        else:
+            return False
+
+# Collects the values each item of a control-flow graph reads and writes
+# using the same rules as the analysis which fills read_lines and
+# write_lines so both refer to values by the same identifiers
+class _ItemCollector(TaintAnalysis):
+    def __init__(self, func):
+        self.func = func
+        self.taint_obj = None
+        self.passes = self._check_passes(['reads', 'writes',
+                                          'interprocedural'])
+        self._enable(self.passes)
+
+    # Produce the values read and written by an item and the values
+    # it replaces entirely
+    def collect(self, item):
+        self.read_lines = defaultdict(set)
+        self.write_lines = defaultdict(set)
+        self.functions = defaultdict(set)
+        self.taint_exprs = set()
+        self.tainted_by = Provenance()
+        self.helper_calls = []
+
+        kills = set()
+        if isinstance(item, ast.For):
+            targets = [item.target]
+        elif isinstance(item, ast.With):
+            targets = []
+            for with_item in getattr(item, 'items', [item]):
+                self._visit_tree(with_item.context_expr)
+                if with_item.optional_vars is not None:
+                    targets.append(with_item.optional_vars)
+        else:
+            self._visit_tree(item)
+            targets = item.targets if isinstance(item, ast.Assign) else []
+
+        # Assigned names and attributes of self are replaced
+        writes = set(obj for obj in self.write_lines if _is_portable(obj))
+        for target in _flatten_targets(targets):
+            obj = target_id(target)
+            if obj is not None and not isinstance(target, ast.Subscript):
+                writes.add(obj)
+                kills.add(obj)
+
+        reads = dict((obj, linenos) for obj, linenos
+                     in self.read_lines.items() if _is_portable(obj))
+        return reads, writes, kills
+
+# Get the first and last lines of the part of a statement an item in
+# a block stands for, leaving out the bodies of compound statements
+def item_span(item):
+    if isinstance(item, ast.For):
+        roots = [item.target]
+    elif isinstance(item, ast.With):
+        roots = []
+        for with_item in getattr(item, 'items', [item]):
+            roots.append(with_item.context_expr)
+            if with_item.optional_vars is not None:
+                roots.append(with_item.optional_vars)
+    else:
+        roots = [item]
+
+    linenos = [item.lineno]
+    for root in roots:
+        for node in ast.walk(root):
+            lineno = getattr(node, 'lineno', None)
+            if lineno is not None:
+                linenos.append(lineno)
+
+    return min(linenos), max(linenos)
+
+# Produce the targets within tuple and list assignments
+def _flatten_targets(targets):
+    stack = list(targets)
+    while stack:
+        target = stack.pop()
+        if isinstance(target, (ast.Tuple, ast.List)):
+            stack.extend(target.elts)
+        elif target.__class__.__name__ == 'Starred':
+            stack.append(target.value)
+        else:
+            yield target
+
+# Solve a problem where each block transforms a set of bits as
+# out = gen | (in & ~kill) and the sets of predecessors are combined
+# Backward problems use the successors of each block instead
+def solve_bits(cfg, gen, kill, forward=True, entry=0):
+    rpo = reverse_postorder(cfg)
+    if forward:
+        order = rpo
+        start = cfg.entry
+        preds = [block.preds for block in cfg.blocks]
+        succs = [block.succs for block in cfg.blocks]
+    else:
+        order = rpo[::-1]
+        start = cfg.exit
+        preds = [block.succs for block in cfg.blocks]
+        succs = [block.preds for block in cfg.blocks]
+
+    priority = dict((block.index, i) for i, block in enumerate(order))
+    block_in = [0] * len(cfg)
+    block_out = [0] * len(cfg)
+    block_in[start.index] = entry
+
+    worklist = [(i, index) for index, i in priority.items()]
+    heapq.heapify(worklist)
+    queued = set(priority)
+
+    while worklist:
+        _, index = heapq.heappop(worklist)
+        queued.discard(index)
+
+        bits = entry if index == start.index else 0
+        for pred in preds[index]:
+            bits |= block_out[pred.index]
+        block_in[index] = bits
+
+        bits = gen[index] | (bits & ~kill[index])
+        if bits != block_out[index]:
+            block_out[index] = bits
+            for succ in succs[index]:
+                if succ.index not in queued and succ.index in priority:
+                    queued.add(succ.index)
+                    heapq.heappush(worklist, (priority[succ.index],
+                                              succ.index))
+
+    return block_in, block_out
+
+# The values read and written by every reachable item in a function
+# in the order of its blocks along with the block, line and span of
+# lines of each item
+# Reads map each value to the lines it is read on within the item
+# The arguments of the function are defined by a definition on entry
+class ItemUses(object):
+    def __init__(self, cfg, func=None):
+        self.cfg = cfg
+        self.args = _arg_names(cfg.func_ast)
+        self.items = []
+        self.blocks = []
+        self.linenos = []
+        self.spans = []
+        self.reads = []
+        self.writes = []
+        self.kills = []
+        self.block_items = [[] for _ in cfg.blocks]
+
+        collector = _ItemCollector(func)
+        for block in reverse_postorder(cfg):
+            for item in block.items:
+                reads, writes, kills = collector.collect(item)
+                self.block_items[block.index].append(len(self.items))
+                self.items.append(item)
+                self.blocks.append(block.index)
+                self.linenos.append(item.lineno)
+                self.spans.append(item_span(item))
+                self.reads.append(reads)
+                self.writes.append(writes)
+                self.kills.append(kills)
+
+# Reaching definitions with a bit for each write by an item and for
+# each argument defined on entry to the function
+class ReachingDefinitions(object):
+    def __init__(self, uses):
+        self.uses = uses
+        cfg = uses.cfg
+
+        # Definitions are pairs of values and the items defining them
+        # where arguments are defined by no item
+        self.defs = []
+        self.item_defs = []
+        self.value_defs = defaultdict(int)
+        for arg in uses.args:
+            self._add_def(arg, None)
+        entry = bits_of(range(len(self.defs)))
+
+        for i, writes in enumerate(uses.writes):
+            self.item_defs.append([(obj, self._add_def(obj, i))
+                                   for obj in writes])
+
+        gen = [0] * len(cfg)
+        kill = [0] * len(cfg)
+        for block in cfg.blocks:
+            bits = 0
+            killed = 0
+            for i in uses.block_items[block.index]:
+                bits, item_killed = self._transfer(i, bits)
+                killed |= item_killed
+            gen[block.index] = bits
+            kill[block.index] = killed
+
+        self.block_in, self.block_out = solve_bits(cfg, gen, kill,
+                                                   entry=entry)
+
+        # The definitions reaching each item before it runs
+        self.reach = [0] * len(uses.items)
+        for block in cfg.blocks:
+            bits = self.block_in[block.index]
+            for i in uses.block_items[block.index]:
+                self.reach[i] = bits
+                bits = self._transfer(i, bits)[0]
+
+    def _add_def(self, obj, item):
+        bit = len(self.defs)
+        self.defs.append((obj, item))
+        self.value_defs[obj] |= 1 << bit
+        return bit
+
+    # Produce the definitions after an item and those it removes
+    def _transfer(self, i, bits):
+        killed = 0
+        for obj in self.uses.kills[i]:
+            killed |= self.value_defs[obj]
+        bits &= ~killed
+        for obj, bit in self.item_defs[i]:
+            bits |= 1 << bit
+        return bits, killed
+
+    # Get the definitions of a value which may reach an item
+    def reaching(self, i, obj):
+        return [self.defs[bit] for bit in
+                iter_bits(self.reach[i] & self.value_defs.get(obj, 0))]
+
+# Live values with a bit for each value which may be read
+# before it is next replaced
+class Liveness(object):
+    def __init__(self, uses):
+        self.uses = uses
+        self.values = Interner()
+        cfg = uses.cfg
+
+        reads = [self._bits(objs) for objs in uses.reads]
+        kills = [self._bits(objs) for objs in uses.kills]
+        self._item_reads = reads
+        self._item_kills = kills
+
+        gen = [0] * len(cfg)
+        kill = [0] * len(cfg)
+        for block in cfg.blocks:
+            bits = 0
+            killed = 0
+            for i in reversed(uses.block_items[block.index]):
+                bits = reads[i] | (bits & ~kills[i])
+                killed = (killed | kills[i]) & ~reads[i]
+            gen[block.index] = bits
+            kill[block.index] = killed
+
+        self.block_out, self.block_in = solve_bits(cfg, gen, kill,
+                                                   forward=False)
+
+        # The values live after each item
+        self.live = [0] * len(uses.items)
+        for block in cfg.blocks:
+            bits = self.block_out[block.index]
+            for i in reversed(uses.block_items[block.index]):
+                self.live[i] = bits
+                bits = reads[i] | (bits & ~kills[i])
+
+    def _bits(self, objs):
+        bits = 0
+        for obj in objs:
+            bits |= 1 << self.values.intern(obj)
+        return bits
+
+    # Get the values which may be read after an item runs
+    def live_after(self, i):
+        return set(self.values.objs_of(self.live[i]))
+
+# Chains linking each read of a value by an item to the writes which
+# may reach it and each write to the reads it may reach
+# Reads are (value, item) pairs and writes are indexes of definitions
+class DefUseChains(object):
+    def __init__(self, cfg, func=None):
+        self.uses = ItemUses(cfg, func)
+        self.defs = ReachingDefinitions(self.uses)
+        uses = self.uses
+        defs = self.defs
+
+        self.use_defs = {}
+        self.def_uses = defaultdict(list)
+        for i, reads in enumerate(uses.reads):
+            reach = defs.reach[i]
+            for obj in reads:
+                bits = list(iter_bits(reach & defs.value_defs.get(obj, 0)))
+                self.use_defs[(obj, i)] = bits
+                for bit in bits:
+                    self.def_uses[bit].append((obj, i))
+
+        # Items sorted by their first line to find those in a range
+        # where items spanning more lines may start before the range
+        spans = uses.spans
+        self._order = sorted(range(len(uses.items)),
+                             key=lambda i: spans[i][0])
+        self._linenos = [spans[i][0] for i in self._order]
+        self._longest = max([maxlineno - minlineno
+                             for minlineno, maxlineno in spans] or [0])
+
+    # Get the items with any lines within a range
+    def items_in_range(self, minlineno, maxlineno):
+        start = bisect_left(self._linenos, minlineno - self._longest)
+        end = bisect_right(self._linenos, maxlineno)
+        spans = self.uses.spans
+        return [i for i in self._order[start:end]
+                if spans[i][1] >= minlineno]
+
+    # Get the lines an item reads a value on
+    def read_linenos(self, obj, item):
+        return self.uses.reads[item].get(obj) or \
+            set([self.uses.linenos[item]])
+
+    # Get the line of a definition or None for a value on entry
+    def def_lineno(self, bit):
+        item = self.defs.defs[bit][1]
+        return None if item is None else self.uses.linenos[item]
+
+    # Get the lines of the writes which may reach a read of
+    # a value on a line where None is the value on entry
+    def writes_reaching(self, obj, lineno):
+        return set(self.def_lineno(bit)
+                   for i in self.items_in_range(lineno, lineno)
+                   if lineno in self.read_linenos(obj, i)
+                   for bit in self.use_defs.get((obj, i), ()))
+
+    # Get the lines of the reads which may be reached by
+    # a write to a value on a line
+    def reads_reached(self, obj, lineno):
+        return set(read_lineno
+                   for item in self.items_in_range(lineno, lineno)
+                   for def_obj, bit in self.defs.item_defs[item]
+                   if def_obj == obj and self.def_lineno(bit) == lineno
+                   for read_obj, i in self.def_uses[bit]
+                   for read_lineno in self.read_linenos(read_obj, i))
+
+    # Get the writes to local variables which are never read
+    # as (value, lineno) pairs
+    def dead_writes(self):
+        return set((obj, self.uses.linenos[item])
+                   for bit, (obj, item) in enumerate(self.defs.defs)
+                   if item is not None and not isinstance(obj, tuple) and
+                   not self.def_uses.get(bit))
+
+# Find the values which flow into and out of each of a list of blocks
+# of lines given as (minlineno, maxlineno) pairs following the def-use
+# chains so values replaced before they are used are left out
+# Values other than local variables are included whenever used as in
+# Analyzer.block_inouts
+# Exceptions raised by any item in a try statement are followed to its
+# handlers and finally clause so values which reach them are kept
+def precise_block_inouts(chains, ranges):
+    uses = chains.uses
+    item_defs = chains.defs.item_defs
+    inouts = []
+    for minlineno, maxlineno in ranges:
+        def inside(lineno):
+            return lineno is not None and minlineno <= lineno <= maxlineno
+
+        def reads_inside(bit):
+            return all(inside(lineno)
+                       for obj, j in chains.def_uses.get(bit, ())
+                       for lineno in chains.read_linenos(obj, j))
+
+        # Items may span more lines than the range so only reads and
+        # writes on lines within the range are considered
+        in_exprs = set()
+        out_exprs = set()
+        for i in chains.items_in_range(minlineno, maxlineno):
+            for obj in uses.reads[i]:
+                if not any(inside(lineno)
+                           for lineno in chains.read_linenos(obj, i)):
+                    continue
+
+                if isinstance(obj, tuple) or \
+                        not all(inside(chains.def_lineno(bit))
+                                for bit in chains.use_defs[(obj, i)]):
+                    in_exprs.add(obj)
+
+            for obj, bit in item_defs[i]:
+                if not inside(chains.def_lineno(bit)):
+                    continue
+
+                if isinstance(obj, tuple) or not reads_inside(bit):
+                    out_exprs.add(obj)
+
+        inouts.append((in_exprs, out_exprs))
+
+    return inouts
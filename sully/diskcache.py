@@ -0,0 +1,99 @@
+import errno
+import os
+import pickle
+import platform
+import sqlite3
+import sys
+import threading
+
+# Identify the interpreter since the AST differs between versions
+PYTHON_VERSION = '%s-%d.%d' % ((platform.python_implementation(),) +
+                               tuple(sys.version_info[:2]))
+
+# Persist analysis summaries in a SQLite database which can be shared
+# by any number of processes reading and writing concurrently
+class DiskCache(object):
+    FILENAME = 'sully-cache.sqlite3'
+
+    def __init__(self, directory, version, timeout=30.0):
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.version = version
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+
+        # Connections cannot be shared across threads or a fork
+        self._local = threading.local()
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    # Get a connection owned by the current thread and process
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+
+        # Write-ahead logging lets readers proceed while another
+        # process is writing to the database
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS summaries ('
+                     'key TEXT NOT NULL, '
+                     'sully_version TEXT NOT NULL, '
+                     'python_version TEXT NOT NULL, '
+                     'summary BLOB NOT NULL, '
+                     'PRIMARY KEY (key, sully_version, python_version))')
+        conn.commit()
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # Load a stored summary or return None if there is none
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT summary FROM summaries WHERE key = ? AND '
+            'sully_version = ? AND python_version = ?',
+            (key, self.version, PYTHON_VERSION)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        # Treat anything we cannot load as missing so it gets replaced
+        try:
+            summary = pickle.loads(bytes(row[0]))
+        except Exception:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return summary
+
+    # Store a summary, replacing any previous value for the same key
+    def put(self, key, summary):
+        data = pickle.dumps(summary, pickle.HIGHEST_PROTOCOL)
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO summaries '
+                         'VALUES (?, ?, ?, ?)',
+                         (key, self.version, PYTHON_VERSION,
+                          sqlite3.Binary(data)))
+
+    # Remove all stored summaries
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM summaries')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,150 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from sully import Interner, bits_of
+
+# Matrices of values by lines recording where each value is read and
+# written so many blocks can be checked at once
+# With NumPy each matrix is a boolean array whose columns are the lines
+# from minlineno to maxlineno and blocks are checked with cumulative sums
+# Without NumPy each row is kept as an integer with a bit for each line
+class UsageMatrix(object):
+    def __init__(self, read_lines, write_lines, args=()):
+        self.interner = Interner()
+        for lines in (read_lines, write_lines):
+            for obj, linenos in lines.items():
+                if linenos:
+                    self.interner.intern(obj)
+
+        linenos = [lineno for lines in (read_lines, write_lines)
+                   for obj_linenos in lines.values()
+                   for lineno in obj_linenos]
+        self.minlineno = min(linenos) if linenos else 1
+        self.maxlineno = max(linenos) if linenos else 0
+        self.width = self.maxlineno - self.minlineno + 1
+
+        # Locals are only used by a block if they flow into or out of it
+        objs = self.interner.objs
+        args = set(args)
+        nonlocal_ids = [i for i, obj in enumerate(objs)
+                        if isinstance(obj, tuple)]
+        arg_ids = [i for i, obj in enumerate(objs) if obj in args]
+
+        if numpy is not None:
+            self.reads = self._dense(read_lines)
+            self.writes = self._dense(write_lines)
+
+            self._nonlocal = numpy.zeros(len(objs), dtype=bool)
+            self._nonlocal[nonlocal_ids] = True
+            self._arg = numpy.zeros(len(objs), dtype=bool)
+            self._arg[arg_ids] = True
+        else:
+            self.reads = self._rows(read_lines)
+            self.writes = self._rows(write_lines)
+            self._nonlocal = bits_of(nonlocal_ids)
+            self._arg = bits_of(arg_ids)
+
+        self._sums = None
+
+    @classmethod
+    def from_summary(cls, summary):
+        return cls(summary.read_lines, summary.write_lines, summary.args)
+
+    def _dense(self, lines):
+        matrix = numpy.zeros((len(self.interner), self.width), dtype=bool)
+        for obj, linenos in lines.items():
+            if linenos:
+                columns = [lineno - self.minlineno for lineno in linenos]
+                matrix[self.interner.get(obj), columns] = True
+        return matrix
+
+    def _rows(self, lines):
+        rows = [0] * len(self.interner)
+        for obj, linenos in lines.items():
+            if linenos:
+                rows[self.interner.get(obj)] = bits_of(
+                    lineno - self.minlineno for lineno in linenos)
+        return rows
+
+    # Get the reads or writes as a list of rows of booleans
+    # for each value whether or not NumPy is available
+    def to_lists(self, matrix):
+        if numpy is not None:
+            return matrix.tolist()
+
+        return [[bool(row >> column & 1) for column in range(self.width)]
+                for row in matrix]
+
+    # Get the values which are read and written in each of a list of blocks
+    # given as (minlineno, maxlineno) pairs considering only the values
+    # used directly in the function
+    def block_inouts(self, ranges):
+        if not ranges:
+            return []
+        elif numpy is not None:
+            return self._dense_block_inouts(ranges)
+        else:
+            return self._bit_block_inouts(ranges)
+
+    def _column(self, lineno):
+        return min(max(lineno - self.minlineno, 0), self.width)
+
+    def _dense_block_inouts(self, ranges):
+        # Count the uses before each line with a column of zeros first
+        if self._sums is None:
+            shape = (len(self.interner), self.width + 1)
+            self._sums = []
+            for matrix in (self.reads, self.writes):
+                sums = numpy.zeros(shape, dtype=numpy.int32)
+                numpy.cumsum(matrix, axis=1, dtype=numpy.int32,
+                             out=sums[:, 1:])
+                self._sums.append(sums)
+        read_sums, write_sums = self._sums
+
+        starts = numpy.array([self._column(minlineno)
+                              for minlineno, _ in ranges])
+        ends = numpy.array([max(self._column(maxlineno + 1), column)
+                            for (_, maxlineno), column in zip(ranges, starts)])
+
+        read_in = read_sums[:, ends] > read_sums[:, starts]
+        write_in = write_sums[:, ends] > write_sums[:, starts]
+        written_before = write_sums[:, starts] > 0
+        read_after = read_sums[:, -1:] > read_sums[:, ends]
+
+        # Apply the same rules as Analyzer.block_inouts to every block
+        nonlocal_ = self._nonlocal[:, numpy.newaxis]
+        arg = self._arg[:, numpy.newaxis]
+        ins = read_in & (nonlocal_ | written_before | arg)
+        outs = write_in & (nonlocal_ | read_after)
+
+        objs = self.interner.objs
+        return [(set(objs[i] for i in numpy.flatnonzero(ins[:, j])),
+                 set(objs[i] for i in numpy.flatnonzero(outs[:, j])))
+                for j in range(len(ranges))]
+
+    def _bit_block_inouts(self, ranges):
+        inouts = []
+        for minlineno, maxlineno in ranges:
+            start = self._column(minlineno)
+            end = max(self._column(maxlineno + 1), start)
+            before = (1 << start) - 1
+            block = ((1 << end) - 1) ^ before
+
+            ins = 0
+            outs = 0
+            for i, (reads, writes) in enumerate(zip(self.reads,
+                                                    self.writes)):
+                bit = 1 << i
+                if reads & block and (self._nonlocal & bit or
+                                      self._arg & bit or writes & before):
+                    ins |= bit
+                if writes & block and (self._nonlocal & bit or
+                                       reads >> end):
+                    outs |= bit
+
+            inouts.append((set(self.interner.objs_of(ins)),
+                           set(self.interner.objs_of(outs))))
+
+        return inouts
@@ -0,0 +1,188 @@
+import ast
+import os
+from collections import OrderedDict
+
+from sully import Summary, TaintAnalysis
+from sully.callgraph import CallGraph
+
+# Wrap the definition of a function in a module as if the source of the
+# function had been parsed alone so it can be analyzed without parsing
+# its source again
+# The nodes are shared with the tree of the file so line numbers are
+# line numbers in the file rather than in the function
+def function_tree(node):
+    tree = ast.Module(body=[node])
+    if 'type_ignores' in ast.Module._fields:
+        tree.type_ignores = []
+    return tree
+
+# Produce the statements in a body including those within compound
+# statements such as if and try, but not within functions or classes
+def _statements(body):
+    stack = list(reversed(body))
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            continue
+
+        children = []
+        for field in ('body', 'orelse', 'handlers', 'finalbody'):
+            for child in getattr(node, field, None) or ():
+                if isinstance(child, ast.stmt):
+                    children.append(child)
+                elif isinstance(child, ast.AST):
+                    # Exception handlers are not statements on Python 3
+                    children.extend(child.body)
+        stack.extend(reversed(children))
+
+# Find the functions and methods defined in a module as (class, name)
+# pairs where class is the qualified name of the class or None along
+# with their definitions in the order they appear
+# A name defined more than once refers to the last definition, as it
+# would when the module runs, and earlier ones are named name@lineno
+# Functions defined inside other functions are analyzed with them
+def find_functions(tree):
+    found = []
+    stack = [(None, tree.body)]
+    while stack:
+        owner, body = stack.pop(0)
+        for node in _statements(body):
+            if isinstance(node, ast.FunctionDef):
+                found.append((owner, node))
+            elif isinstance(node, ast.ClassDef):
+                name = node.name if owner is None \
+                    else owner + '.' + node.name
+                stack.append((name, node.body))
+
+    last = dict(((owner, node.name), node) for owner, node in found)
+    functions = OrderedDict()
+    for owner, node in found:
+        if last[(owner, node.name)] is node:
+            functions[(owner, node.name)] = node
+        else:
+            functions[(owner, '%s@%d' % (node.name, node.lineno))] = node
+
+    return functions
+
+# Get the name of a function or method found by find_functions
+def qualified_name(method):
+    owner, name = method
+    return name if owner is None else owner + '.' + name
+
+# A call graph of the functions in a parsed module where methods call
+# other methods of the same class defined in the module
+# Methods defined elsewhere, such as on a base class in another module,
+# have no summary and their reads and writes are not included
+class ModuleCallGraph(CallGraph):
+    def __init__(self, functions):
+        super(ModuleCallGraph, self).__init__()
+        self.trees = OrderedDict((method, function_tree(node))
+                                 for method, node in functions.items())
+        self.errors = OrderedDict()
+
+        # Find the calls of every function first so no function
+        # which could not be analyzed is added as a callee
+        for method, tree in self.trees.items():
+            try:
+                self._calls[method] = TaintAnalysis(
+                    tree, node_table=True, passes=['calls'])
+            except Exception as e:
+                self.errors[method] = e
+        self.add_methods(list(self._calls))
+
+    def function(self, method):
+        return self.trees[method]
+
+    def callee(self, method, name):
+        callee = (method[0], name)
+        if method[0] is not None and callee in self.trees and \
+                callee not in self.errors:
+            return callee
+
+    # Summaries are kept with the module rather than shared since
+    # the trees are not kept once the module is analyzed
+    def cached(self, method):
+        return None
+
+    def store(self, method, summary):
+        pass
+
+    def helpers_for(self, method):
+        def helpers(cls, name):
+            callee = self.callee(method, name)
+            if callee is not None:
+                return self.summaries.get(callee)
+        return helpers
+
+    def analyze(self, method, in_cycle=False):
+        return Summary.from_analysis(TaintAnalysis(
+            self.trees[method], node_table=True,
+            helpers=self.helpers_for(method)))
+
+    # Record errors in a component instead of stopping the analysis
+    # of the rest of the module
+    def summarize_component(self, methods):
+        try:
+            super(ModuleCallGraph, self).summarize_component(methods)
+        except Exception as e:
+            for method in methods:
+                self.summaries.pop(method, None)
+                self.errors[method] = e
+
+# Summaries of every function and method in a module keyed by their
+# qualified names after parsing the module once
+# Errors are recorded for the module if it could not be parsed and for
+# each function which could not be analyzed
+class ModuleAnalysis(object):
+    def __init__(self, path, source=None):
+        self.path = path
+        self.summaries = OrderedDict()
+        self.errors = OrderedDict()
+        self.linenos = OrderedDict()
+        self.error = None
+
+        try:
+            if source is None:
+                with open(path, 'rb') as f:
+                    source = f.read()
+            tree = ast.parse(source, path)
+        except Exception as e:
+            self.error = e
+            return
+
+        functions = find_functions(tree)
+        graph = ModuleCallGraph(functions)
+        graph.summarize()
+
+        # Keep the functions in the order they are defined
+        for method, node in functions.items():
+            name = qualified_name(method)
+            self.linenos[name] = node.lineno
+            if method in graph.summaries:
+                self.summaries[name] = graph.summaries[method]
+            else:
+                self.errors[name] = graph.errors[method]
+
+    def __repr__(self):
+        return '<ModuleAnalysis %s>' % self.path
+
+# Find the Python files at a path which is either a file or a directory
+# searched recursively, in sorted order
+def find_modules(path):
+    if not os.path.isdir(path):
+        return [path]
+
+    paths = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                paths.append(os.path.join(root, name))
+
+    return paths
+
+# Analyze every module in a file or package directory
+def analyze_path(path):
+    return OrderedDict((module, ModuleAnalysis(module))
+                       for module in find_modules(path))
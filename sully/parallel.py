@@ -0,0 +1,72 @@
+import heapq
+import multiprocessing
+import os
+from collections import OrderedDict
+
+from sully.modules import ModuleAnalysis, find_modules
+
+# The number of chunks given to each process so processes which finish
+# early can take more work while keeping the number of tasks small
+CHUNKS_PER_PROCESS = 4
+
+# Split files into chunks with roughly the same total size by giving
+# each file, largest first, to the chunk with the smallest total so far
+# Files are sorted by name within each chunk
+def chunk_by_size(paths, chunks):
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append((-os.path.getsize(path), path))
+        except OSError:
+            sizes.append((0, path))
+    sizes.sort()
+
+    chunks = max(min(chunks, len(paths)), 1)
+    heap = [(0, i) for i in range(chunks)]
+    assigned = [[] for _ in range(chunks)]
+    for size, path in sizes:
+        total, i = heapq.heappop(heap)
+        assigned[i].append(path)
+        heapq.heappush(heap, (total - size, i))
+
+    return [sorted(chunk) for chunk in assigned if chunk]
+
+# Analyze a chunk of files in a worker process
+# Only the summaries are sent back since the trees are not kept
+def _analyze_chunk(paths):
+    return [(path, ModuleAnalysis(path)) for path in paths]
+
+# Analyze every module at the given paths, which are files or package
+# directories, using a pool of processes
+# The result is the same as analyze_path for each path in turn
+# regardless of the number of processes or the order chunks finish in
+def analyze_paths(paths, processes=None):
+    modules = []
+    seen = set()
+    for path in paths:
+        for module in find_modules(path):
+            if module not in seen:
+                seen.add(module)
+                modules.append(module)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(modules))
+
+    analyses = {}
+    if processes <= 1:
+        analyses.update(_analyze_chunk(modules))
+    else:
+        chunks = chunk_by_size(modules, processes * CHUNKS_PER_PROCESS)
+        pool = multiprocessing.Pool(processes)
+        try:
+            for results in pool.imap_unordered(_analyze_chunk, chunks):
+                analyses.update(results)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    return OrderedDict((module, analyses[module]) for module in modules)
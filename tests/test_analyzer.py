@@ -0,0 +1,143 @@
+import pytest
+
+import ast
+from sully import Analyzer, block_inout
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def helper(self):
+        return self.z
+
+    def foo(self, z):
+        x = [1, 2, 3]                   # 2
+        for y in x:                     # 3
+            print(y)                    # 4
+            x.append(y + 1)             # 5
+            break                       # 6
+        self.a = self.helper()          # 7
+        return z                        # 8
+
+    def baz(self):
+        x = self.a                      # 2
+        x = 1                           # 3
+        y = x + 1                       # 4
+        while y:                        # 5
+            self.b = y                  # 6
+            y = y - 1                   # 7
+        return x                        # 8
+
+    def qux(self, a):
+        b = a                           # 2
+        c = 1                           # 3
+        raise ValueError('%s %s' %      # 4
+                         (b, c))        # 5
+
+    def handled(self, t):
+        x = 1                           # 2
+        try:                            # 3
+            x = t.get()                 # 4
+            g(x)                        # 5
+            x = 3                       # 6
+        except ValueError:              # 7
+            h(x)                        # 8
+        return x                        # 9
+
+    def cleanup(self, t):
+        x = 1                           # 2
+        try:                            # 3
+            x = t.get()                 # 4
+            g()                         # 5
+            x = 3                       # 6
+        finally:                        # 7
+            h(x)                        # 8
+
+# ==========
+
+@pytest.fixture
+def analyzer():
+    return Analyzer(Bar.foo)
+
+def test_block_inout(analyzer):
+    assert analyzer.block_inout(3, 6) == (set(['x']), set([]))
+    assert analyzer.block_inout(2, 2) == (set([]), set(['x']))
+
+def test_helper_inout(analyzer):
+    in_exprs, out_exprs = analyzer.block_inout(7, 7)
+    assert in_exprs == set([('self', 'z')])
+    assert out_exprs == set([('self', 'a')])
+
+def test_matches_block_inout(analyzer):
+    for minlineno in range(2, 9):
+        for maxlineno in range(minlineno, 9):
+            assert analyzer.block_inout(minlineno, maxlineno) == \
+                   block_inout(Bar.foo, minlineno, maxlineno)
+
+def test_block_including(analyzer):
+    block = analyzer.block_including(5, 6)
+    assert len(block) == 1
+    assert isinstance(block[0], ast.For)
+
+def test_block_inouts(analyzer):
+    ranges = [(minlineno, maxlineno) for minlineno in range(2, 9)
+              for maxlineno in range(minlineno, 9)]
+    inouts = analyzer.block_inouts(ranges)
+
+    assert len(inouts) == len(ranges)
+    for (minlineno, maxlineno), inout in zip(ranges, inouts):
+        assert inout == block_inout(Bar.foo, minlineno, maxlineno)
+
+def test_shared_cfg():
+    analyzer = Analyzer(Bar.foo)
+    assert analyzer.cfg is Analyzer(Bar.foo).cfg
+    assert analyzer.cfg.func_ast is analyzer.taint.func_ast
+
+def test_precise_block_inout():
+    analyzer = Analyzer(Bar.baz)
+
+    # The value written on line 2 is replaced before it is read
+    assert analyzer.block_inout(2, 2) == \
+        (set([('self', 'a')]), set(['x']))
+    assert analyzer.block_inout(2, 2, precise=True) == \
+        (set([('self', 'a')]), set())
+
+    # Values flow around the loop and out of the block
+    assert analyzer.block_inout(6, 7, precise=True) == \
+        (set(['y']), set([('self', 'b'), 'y']))
+    assert analyzer.block_inout(3, 4, precise=True) == \
+        (set(), set(['x', 'y']))
+
+def test_precise_loop_variable(analyzer):
+    # The loop variable is defined by the loop and the break means
+    # the append is never seen by the next iteration
+    assert analyzer.block_inout(4, 5, precise=True) == (set(['y']), set())
+    assert analyzer.block_inout(7, 7, precise=True) == \
+        analyzer.block_inout(7, 7)
+
+def test_precise_continuation_lines():
+    analyzer = Analyzer(Bar.qux)
+
+    # Reads on the continuation line of a statement are on that line
+    for lineno in (4, 5):
+        assert analyzer.block_inout(lineno, lineno, precise=True) == \
+            analyzer.block_inout(lineno, lineno)
+    assert analyzer.block_inout(5, 5, precise=True) == \
+        (set(['b', 'c']), set())
+
+@pytest.mark.parametrize('name', ['handled', 'cleanup'])
+def test_precise_exception_paths(name):
+    analyzer = Analyzer(getattr(Bar, name))
+
+    # The value written before the call reaches the handler or finally
+    # clause if the call raises so it must leave the block
+    assert 'x' in analyzer.block_inout(4, 4, precise=True)[1]
+
+    # No value read by the handler or finally clause is missing from a
+    # precise block which the default mode says it leaves
+    for minlineno in range(2, 7):
+        for maxlineno in range(minlineno, 7):
+            out = analyzer.block_inout(minlineno, maxlineno)[1]
+            precise = analyzer.block_inout(minlineno, maxlineno,
+                                           precise=True)[1]
+            assert set(['x']) & out <= precise
@@ -0,0 +1,103 @@
+import pytest
+
+from sully import Analyzer, LRUCache, TaintAnalysis, analysis_cache, \
+                  analyze, helper_cache, summarize, summary_cache
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def foo(self, tainted):
+        x = tainted.baz()              # 2
+        return x                       # 3
+
+    def bar(self, tainted):
+        x = tainted.baz()              # 2
+        return x                       # 3
+
+# ==========
+
+@pytest.fixture
+def cache():
+    analysis_cache.clear()
+    return analysis_cache
+
+def test_lru_eviction():
+    lru = LRUCache(maxsize=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1
+    lru.put('c', 3)
+
+    assert 'a' in lru
+    assert 'b' not in lru
+    assert lru.evictions == 1
+
+def test_lru_counters():
+    lru = LRUCache(maxsize=2)
+    lru.put('a', 1)
+    lru.get('a')
+    lru.get('b')
+    assert lru.stats() == {'hits': 1, 'misses': 1, 'evictions': 0,
+                           'size': 1, 'maxsize': 2}
+
+def test_analyze_cached(cache):
+    taint = analyze(Bar.foo, 'tainted')
+    assert analyze(Bar.foo, 'tainted') is taint
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_analyze_different_source(cache):
+    # Identical bodies only differ in their name so they are not shared
+    assert analyze(Bar.foo) is not analyze(Bar.bar)
+    assert cache.misses == 2
+
+def test_analyze_taint_obj(cache):
+    assert analyze(Bar.foo) is not analyze(Bar.foo, 'tainted')
+    assert analyze(Bar.foo, 'tainted').taint_exprs
+
+class Baz:
+    def helper(self, x):
+        x.append(self.a)
+
+    def foo(self):
+        a = []                         # 2
+        self.helper(a)                 # 3
+        self.helper(a)                 # 4
+        self.helper(a)                 # 5
+
+def test_helper_analyzed_once():
+    helper_cache.clear()
+    summary_cache.clear()
+    taint = TaintAnalysis(Baz.foo)
+
+    assert helper_cache.misses == 1
+    assert helper_cache.hits == 2
+    assert taint.read_lines[('self', 'a')] == set([3, 4, 5])
+    assert taint.write_lines['a'] == set([2, 3, 4, 5])
+
+# Classes with the same name whose methods have the same source
+def handler(attr):
+    class Handler:
+        def foo(self):
+            self.helper()              # 2
+
+        if attr == 'a':
+            def helper(self):
+                return self.a
+        else:
+            def helper(self):
+                return self.b
+
+    return Handler
+
+def test_same_class_name(cache):
+    helper_cache.clear()
+    summary_cache.clear()
+    a = handler('a')
+    b = handler('b')
+
+    assert list(summarize(a.foo).read_lines) == [('self', 'a')]
+    assert list(summarize(b.foo).read_lines) == [('self', 'b')]
+    assert analyze(a.foo) is not analyze(b.foo)
+    assert Analyzer(b.foo).block_inout(2, 2)[0] == set([('self', 'b')])
@@ -0,0 +1,73 @@
+import pytest
+
+from sully import TaintAnalysis, helper_cache, summary_cache
+from sully.callgraph import CallGraph
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def countdown(self, n):
+        self.a = n
+        if n:
+            self.countdown(n)
+
+    def even(self, n):
+        self.b = n
+        self.odd(n)
+
+    def odd(self, n):
+        x = self.c
+        self.even(x)
+
+    def leaf(self):
+        return self.d
+
+    def caller(self):
+        self.leaf()
+        self.even(1)
+
+# ==========
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    helper_cache.clear()
+    summary_cache.clear()
+
+def test_edges():
+    graph = CallGraph(Bar, ['caller'])
+    assert set(graph) == set([(Bar, 'caller'), (Bar, 'leaf'),
+                              (Bar, 'even'), (Bar, 'odd')])
+    assert graph.edges[(Bar, 'caller')] == [(Bar, 'even'), (Bar, 'leaf')]
+
+def test_sccs():
+    components = CallGraph(Bar).sccs()
+    assert sorted(map(sorted, components)) == [
+        [(Bar, 'caller')], [(Bar, 'countdown')],
+        [(Bar, 'even'), (Bar, 'odd')], [(Bar, 'leaf')]]
+
+    # Methods come after those they call
+    position = dict((method, i) for i, component in enumerate(components)
+                    for method in component)
+    assert position[(Bar, 'caller')] > position[(Bar, 'even')]
+    assert position[(Bar, 'caller')] > position[(Bar, 'leaf')]
+
+def test_recursive():
+    taint = TaintAnalysis(Bar.countdown)
+    assert taint.write_lines[('self', 'a')] == set([2, 4])
+
+def test_mutually_recursive():
+    summaries = CallGraph(Bar, ['caller']).summarize()
+    even = summaries[(Bar, 'even')]
+    assert ('self', 'c') in even.read_lines
+    assert ('self', 'b') in summaries[(Bar, 'odd')].write_lines
+
+    taint = TaintAnalysis(Bar.caller)
+    assert taint.read_lines[('self', 'c')] == set([3])
+    assert taint.read_lines[('self', 'd')] == set([2])
+
+def test_shared():
+    CallGraph(Bar, ['odd']).summarize()
+    misses = helper_cache.misses
+    TaintAnalysis(Bar.caller)
+    assert helper_cache.misses == misses + 1
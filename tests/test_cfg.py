@@ -0,0 +1,168 @@
+import pytest
+
+import ast
+from sully.cfg import CFG, cfg_cache, get_cfg, reverse_postorder
+
+# Get the graph of the body of a function given its source
+def cfg(source):
+    return CFG(ast.parse(source))
+
+def test_straight_line():
+    graph = cfg('def foo():\n    x = 1\n    y = x\n')
+    assert len(graph.entry.items) == 2
+    assert graph.entry.succs == [graph.exit]
+
+def test_if():
+    graph = cfg('def foo(a):\n'
+                '    if a:\n'
+                '        x = 1\n'
+                '    else:\n'
+                '        x = 2\n'
+                '    return x\n')
+    assert isinstance(graph.entry.items[0], ast.Name)
+    assert len(graph.entry.succs) == 2
+    then, orelse = graph.entry.succs
+    assert then.succs == orelse.succs
+
+def test_while():
+    graph = cfg('def foo(a):\n'
+                '    while a:\n'
+                '        a = a - 1\n'
+                '    return a\n')
+    header = graph.entry.succs[0]
+    body = header.succs[0]
+    assert body.succs == [header]
+    assert header in header.succs[0].succs
+
+def test_reverse_postorder():
+    graph = cfg('def foo(a):\n'
+                '    for x in a:\n'
+                '        if x:\n'
+                '            y = 1\n'
+                '    return y\n')
+    order = reverse_postorder(graph)
+    assert order[0] is graph.entry
+    assert order[-1] is graph.exit
+
+    # Only the block following the return is unreachable
+    assert len(order) == len(graph) - 1
+
+    # The loop body comes before the code after the loop
+    header = graph.entry.succs[0]
+    assert order.index(header.succs[0]) < order.index(header.succs[1])
+
+def test_return():
+    graph = cfg('def foo(a):\n'
+                '    if a:\n'
+                '        return 1\n'
+                '    return 2\n')
+    then = graph.entry.succs[0]
+    assert then.succs == [graph.exit]
+    assert isinstance(then.items[0], ast.Return)
+
+def test_break_continue():
+    graph = cfg('def foo(a):\n'
+                '    while a:\n'
+                '        if a > 1:\n'
+                '            break\n'
+                '        continue\n'
+                '    else:\n'
+                '        a = 1\n'
+                '    return a\n')
+    header = graph.entry.succs[0]
+    body = header.succs[0]
+    then = body.succs[0]
+    after = then.succs[0]
+    assert isinstance(after.items[0], ast.Return)
+
+    # The else clause is skipped by the break
+    orelse = header.succs[1]
+    assert orelse.succs == [after]
+    assert header in body.succs[1].succs[0].succs
+
+def test_try():
+    graph = cfg('def foo(a):\n'
+                '    try:\n'
+                '        a = a.b()\n'
+                '        if a:\n'
+                '            return a\n'
+                '    except ValueError:\n'
+                '        a = 2\n'
+                '    finally:\n'
+                '        a.close()\n'
+                '    return a\n')
+    blocks = reverse_postorder(graph)
+    handler = [block for block in blocks
+               if block.items and isinstance(block.items[0], ast.Name) and
+               block.items[0].id == 'ValueError'][0]
+    final = [block for block in blocks
+             if block.items and isinstance(block.items[0], ast.Expr)][0]
+
+    # The handler is reached from the body and the return goes
+    # through the finally clause before leaving the function
+    assert len(handler.preds) > 1
+    assert final in handler.succs or final in handler.succs[0].succs
+    assert graph.exit in final.succs
+    assert len(final.succs) == 2
+
+# Get the blocks of a graph which hold an item on a line
+def blocks_at(graph, lineno):
+    return [block for block in graph
+            if any(item.lineno == lineno for item in block.items)]
+
+def test_try_mid_block_raise():
+    graph = cfg('def foo(t):\n'
+                '    try:\n'
+                '        x = t.get()\n'
+                '        g()\n'
+                '        x = 3\n'
+                '    except ValueError:\n'
+                '        h(x)\n')
+    handler, = blocks_at(graph, 6)
+
+    # Each item in the body may raise so each reaches the handler
+    # with the values it leaves behind
+    for lineno in (3, 4, 5):
+        block, = blocks_at(graph, lineno)
+        assert block.items[-1].lineno == lineno
+        assert handler in block.succs
+
+    # So does the start of the body before anything is assigned
+    assert any(not pred.items for pred in handler.preds)
+
+    # Exceptions the handler doesn't match leave the function
+    block, = blocks_at(graph, 4)
+    assert graph.exit in block.succs
+
+def test_try_finally_without_handlers():
+    graph = cfg('def foo(t):\n'
+                '    x = 1\n'
+                '    try:\n'
+                '        x = t.get()\n'
+                '        g()\n'
+                '    finally:\n'
+                '        h(x)\n'
+                '    return x\n')
+    final, = blocks_at(graph, 7)
+    for lineno in (4, 5):
+        block, = blocks_at(graph, lineno)
+        assert final in block.succs
+
+    # Exceptions continue leaving the function after the finally clause
+    assert graph.exit in final.succs
+
+def test_raise_in_try():
+    graph = cfg('def foo(a):\n'
+                '    try:\n'
+                '        raise ValueError(a)\n'
+                '    except ValueError:\n'
+                '        a = 2\n'
+                '    return a\n')
+    block, = blocks_at(graph, 3)
+    handler, = blocks_at(graph, 4)
+    assert handler in block.succs
+
+def test_cached():
+    tree = ast.parse('def foo():\n    return 1\n')
+    assert get_cfg(tree) is get_cfg(tree)
+    assert cfg_cache.get(tree) is get_cfg(tree)
@@ -0,0 +1,136 @@
+import pytest
+
+import ast
+from sully import TaintAnalysis
+from sully.cfg import get_cfg
+from sully.dataflow import ItemUses, Liveness, ReachingDefinitions, \
+    TaintFixpoint, target_id
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def loop(self, tainted):
+        y = 0                          # 2
+        x = 0                          # 3
+        while y < 10:                  # 4
+            y = x + 1                  # 5
+            x = tainted.bar()          # 6
+        return y                       # 7
+
+    def overwrite(self, tainted):
+        x = tainted.bar()              # 2
+        x = 1                          # 3
+        z = x                          # 4
+        for w in tainted.items():      # 5
+            v = w                      # 6
+        return z                       # 7
+
+    def handler(self, tainted):
+        try:                           # 2
+            y = tainted.get()          # 3
+            g()                        # 4
+            y = 0                      # 5
+        except ValueError:             # 6
+            z = h(y)                   # 7
+        return z                       # 8
+
+# ==========
+
+# Get the lines where a variable is assigned a tainted value
+def tainted_lines(analysis, name):
+    return set(expr.lineno for expr in analysis.taint_exprs
+               if isinstance(expr, ast.Name) and expr.id == name and
+               isinstance(expr.ctx, ast.Store))
+
+def test_loop():
+    fixpoint = TaintFixpoint(Bar.loop, 'tainted')
+    assert tainted_lines(fixpoint, 'x') == set([6])
+    assert tainted_lines(fixpoint, 'y') == set([5])
+
+    # A single pass in source order misses the taint from the back edge
+    taint = TaintAnalysis(Bar.loop, 'tainted')
+    assert not any(isinstance(expr, ast.Name) and expr.id == 'y'
+                   for expr in taint.taint_exprs)
+
+def test_block_states():
+    fixpoint = TaintFixpoint(Bar.loop, 'tainted')
+    assert fixpoint.tainted_before(fixpoint.cfg.exit) == set(['x', 'y'])
+    assert fixpoint.tainted_after(fixpoint.cfg.entry) == set()
+
+    # Each block is visited a bounded number of times
+    assert fixpoint.visits <= 3 * len(fixpoint.cfg)
+
+def test_overwrite():
+    fixpoint = TaintFixpoint(Bar.overwrite, 'tainted')
+    assert tainted_lines(fixpoint, 'x') == set([2])
+    assert tainted_lines(fixpoint, 'z') == set()
+    assert tainted_lines(fixpoint, 'w') == set([5])
+    assert tainted_lines(fixpoint, 'v') == set([6])
+
+def test_handler():
+    # The tainted value is still held if the call after it raises
+    fixpoint = TaintFixpoint(Bar.handler, 'tainted')
+    assert tainted_lines(fixpoint, 'z') == set([7])
+
+def test_target_id():
+    assert target_id(ast.parse('x[1][2]').body[0].value) == 'x'
+    assert target_id(ast.parse('self.a').body[0].value) == ('self', 'a')
+    assert target_id(ast.parse('f().a').body[0].value) is None
+
+def uses(source):
+    return ItemUses(get_cfg(ast.parse(source)))
+
+def test_reaching_definitions():
+    items = uses('def foo(a):\n'
+                 '    x = a\n'
+                 '    if x:\n'
+                 '        x = 2\n'
+                 '    return x\n')
+    defs = ReachingDefinitions(items)
+    ret = [i for i, item in enumerate(items.items)
+           if isinstance(item, ast.Return)][0]
+    assert sorted(items.linenos[i] for _, i in defs.reaching(ret, 'x')) == \
+        [2, 4]
+    assert defs.reaching(0, 'a') == [('a', None)]
+
+def test_liveness():
+    items = uses('def foo(a):\n'
+                 '    x = a\n'
+                 '    x = 1\n'
+                 '    y = x\n'
+                 '    return y\n')
+    live = Liveness(items)
+    assert live.live_after(0) == set()
+    assert live.live_after(1) == set(['x'])
+    assert live.live_after(2) == set(['y'])
+    assert live.live_after(3) == set()
+
+# Below are simple objects we use for testing
+# ==========
+
+def chained(a):
+    x = a                              # 2
+    y = 1                              # 3
+    if x:                              # 4
+        x = 2                          # 5
+    return x + y                       # 6
+
+# ==========
+
+def test_def_use():
+    taint = TaintAnalysis(chained)
+    chains = taint.def_use
+    assert chains is taint.def_use
+
+    assert chains.writes_reaching('x', 6) == set([2, 5])
+    assert chains.writes_reaching('a', 2) == set([None])
+    assert chains.reads_reached('x', 2) == set([4, 6])
+    assert chains.reads_reached('y', 3) == set([6])
+
+def test_dead_writes():
+    tree = ast.parse('def foo():\n'
+                     '    x = 1\n'
+                     '    x = 2\n'
+                     '    return x\n')
+    assert TaintAnalysis(tree).def_use.dead_writes() == set([('x', 2)])
@@ -0,0 +1,119 @@
+import pytest
+
+import sully
+from sully import analysis_key, disk_key, get_disk_cache, helper_cache, \
+                  set_cache_dir, summarize, summary_cache
+from sully.diskcache import DiskCache
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def foo(self):
+        x = self.y                     # 2
+        self.z = x                     # 3
+
+class Baz:
+    def foo(self, v):
+        x = self.helper(v)             # 2
+        self.other(x)                  # 3
+
+    def helper(self, v):
+        return self.a + v
+
+    def other(self, v):
+        self.c = v
+
+# A class whose helper reads a different attribute as if its source had
+# been edited between runs
+def make_helper(attr):
+    class Qux:
+        def foo(self):
+            self.helper()              # 2
+
+        if attr == 'a':
+            def helper(self):
+                return self.a
+        else:
+            def helper(self):
+                return self.b
+
+    return Qux
+
+# ==========
+
+@pytest.fixture
+def disk_cache(request, tmpdir):
+    summary_cache.clear()
+    helper_cache.clear()
+    set_cache_dir(str(tmpdir))
+    request.addfinalizer(lambda: set_cache_dir(None))
+    return get_disk_cache()
+
+def test_disabled(monkeypatch, tmpdir):
+    monkeypatch.setenv('SULLY_CACHE_DIR', str(tmpdir))
+    set_cache_dir(None)
+    assert get_disk_cache() is None
+
+def test_environment(monkeypatch, tmpdir):
+    monkeypatch.setenv('SULLY_CACHE_DIR', str(tmpdir))
+    monkeypatch.setattr(sully, '_disk_cache_dir', sully._UNSET)
+    try:
+        first = get_disk_cache()
+        assert first.directory == str(tmpdir)
+        first.get('key')
+
+        # The previous cache is closed when the directory changes
+        monkeypatch.setenv('SULLY_CACHE_DIR', str(tmpdir.mkdir('other')))
+        assert get_disk_cache() is not first
+        assert first._local.conn is None
+    finally:
+        set_cache_dir(None)
+
+def test_summary_stored(disk_cache):
+    summarize(Bar.foo)
+    assert disk_cache.misses == 1
+
+    # A new process starts with an empty memory cache
+    summary_cache.clear()
+    summary = summarize(Bar.foo)
+    assert disk_cache.hits == 1
+    assert summary.read_lines[('self', 'y')] == set([2])
+    assert summary.write_lines[('self', 'z')] == set([3])
+
+def test_shared(disk_cache, tmpdir):
+    summarize(Bar.foo)
+
+    other = DiskCache(str(tmpdir), sully.__version__)
+    summary, helper_calls = other.get(disk_key(analysis_key(Bar.foo)))
+    assert helper_calls == []
+    assert summary.args == ['self']
+    assert summary.write_lines['x'] == set([2])
+
+def test_version(disk_cache, tmpdir):
+    summarize(Bar.foo)
+
+    other = DiskCache(str(tmpdir), 'other')
+    assert other.get(disk_key(analysis_key(Bar.foo))) is None
+
+def test_helper_results_added(disk_cache):
+    summary = summarize(Baz.foo)
+    assert summary.read_lines[('self', 'a')] == set([2])
+    assert summary.write_lines[('self', 'c')] == set([3])
+
+    # Stored results are the same whether or not they are loaded
+    summary_cache.clear()
+    helper_cache.clear()
+    loaded = summarize(Baz.foo)
+    assert disk_cache.hits >= 1
+    assert loaded == summary
+
+def test_helper_changed(disk_cache):
+    summarize(make_helper('a').foo)
+
+    # A new process where only the helper has changed
+    summary_cache.clear()
+    helper_cache.clear()
+    summary = summarize(make_helper('b').foo)
+    assert ('self', 'a') not in summary.read_lines
+    assert summary.read_lines[('self', 'b')] == set([2])
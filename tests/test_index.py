@@ -0,0 +1,78 @@
+import pytest
+
+import pickle
+from sully import Interner, LineIndex, Summary, TaintAnalysis, bits_of, \
+                  iter_bits
+
+@pytest.fixture
+def index():
+    return LineIndex({'x': set([7, 3, 5]), 'y': set([2]), 'z': set()})
+
+def test_linenos(index):
+    assert index.linenos('x') == [3, 5, 7]
+    assert index.linenos('z') == []
+    assert 'z' not in index
+
+def test_any_in_range(index):
+    assert index.any_in_range('x', 4, 5)
+    assert not index.any_in_range('x', 4, 4)
+    assert not index.any_in_range('x', 8, 10)
+    assert index.any_in_range('x', None, 3)
+    assert index.any_in_range('x', 7, None)
+
+def test_any_before_after(index):
+    assert index.any_before('x', 4)
+    assert not index.any_before('x', 3)
+    assert index.any_after('x', 6)
+    assert not index.any_after('x', 7)
+    assert not index.any_after('w', 0)
+
+def test_in_range(index):
+    assert index.in_range(1, 2) == set(['y'])
+    assert index.in_range(2, 3) == set(['x', 'y'])
+
+def test_bits():
+    assert bits_of([0, 3]) == 9
+    assert list(iter_bits(bits_of([70, 2, 5]))) == [2, 5, 70]
+
+def test_interner():
+    interner = Interner(['x', ('self', 'a')])
+    assert interner.intern('x') == 0
+    assert interner.intern('y') == 2
+    assert interner.get('z') is None
+    assert interner[1] == ('self', 'a')
+    assert interner.objs_of(bits_of([0, 2])) == ['x', 'y']
+
+# Below are simple objects we use for testing
+# ==========
+
+def foo():
+    x = 1                              # 2
+    y = x + 1                          # 3
+    return x + y                       # 4
+
+# ==========
+
+def test_analysis_index():
+    taint = TaintAnalysis(foo)
+    assert taint.read_index.linenos('x') == [3, 4]
+    assert taint.write_index.any_before('y', 4)
+    assert taint.read_index.lines == taint.read_lines
+
+def test_summary_lines():
+    taint = TaintAnalysis(foo)
+    summary = Summary.from_analysis(taint)
+    assert summary.read_lines == taint.read_lines
+    assert summary.read_index.linenos('x') == [3, 4]
+
+    # Line sets are produced on use rather than kept
+    assert summary.read_lines is not summary.read_lines
+    assert not hasattr(summary, '__dict__')
+
+def test_summary_pickle():
+    summary = Summary(['self'], {'x': set([3, 4])}, {('self', 'a'): set([5])},
+                      {})
+    loaded = pickle.loads(pickle.dumps(summary, pickle.HIGHEST_PROTOCOL))
+    assert loaded == summary
+    assert loaded.write_lines == {('self', 'a'): set([5])}
+    assert 'x' in loaded.read_index
@@ -0,0 +1,74 @@
+import pytest
+
+import ast
+from sully import LazyTaintAnalysis, TaintAnalysis
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def foo(self, tainted):
+        x = tainted.baz()              # 2
+        self.a = x + 1                 # 3
+        self.b.qux(self.a)             # 4
+        return x                       # 5
+
+# ==========
+
+def test_nothing_computed():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted')
+    assert 'func_ast' not in taint.__dict__
+    assert 'read_lines' not in taint.__dict__
+
+def test_results_match():
+    lazy = LazyTaintAnalysis(Bar.foo, 'tainted')
+    taint = TaintAnalysis(Bar.foo, 'tainted')
+
+    assert lazy.read_lines == taint.read_lines
+    assert lazy.write_lines == taint.write_lines
+    assert lazy.functions == taint.functions
+    assert len(lazy.taint_exprs) == len(taint.taint_exprs)
+
+def test_only_needed_passes():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted')
+    taint.read_lines
+    assert 'read_lines' in taint.__dict__
+    assert 'write_lines' not in taint.__dict__
+    assert 'taint_exprs' not in taint.__dict__
+
+def test_memoized():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted')
+    functions = taint.functions
+    write_lines = taint.write_lines
+    assert taint.functions is functions
+    assert write_lines == TaintAnalysis(Bar.foo, 'tainted').write_lines
+
+def test_parents():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted')
+    expr = [expr for expr in taint.taint_exprs
+            if isinstance(expr, ast.Name) and expr.id == 'x'][0]
+    assert isinstance(expr.parent, ast.Assign)
+
+def test_node_table():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted', node_table=True)
+    expr = [expr for expr in taint.taint_exprs
+            if isinstance(expr, ast.Name) and expr.id == 'x'][0]
+    assert not hasattr(expr, 'parent')
+    assert isinstance(taint.node_table.parent(expr), ast.Assign)
+
+def test_unknown_pass():
+    taint = LazyTaintAnalysis(Bar.foo, 'tainted', passes=['colors'])
+    with pytest.raises(ValueError):
+        taint.read_lines
+
+def test_error_not_memoized():
+    taint = LazyTaintAnalysis(ast.parse('def f(a):\n'
+                                        '    b = 1\n'
+                                        '    a.x.y = b\n'))
+    for _ in range(2):
+        with pytest.raises(Exception):
+            taint.write_lines
+    assert 'write_lines' not in taint.__dict__
+
+    # Reads are computed on their own rather than left empty
+    assert taint.read_lines['b'] == set([3])
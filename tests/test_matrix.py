@@ -0,0 +1,47 @@
+import pytest
+
+from sully import Analyzer
+from sully.matrix import UsageMatrix
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def foo(self, tainted):
+        x = tainted.baz()              # 2
+        y = self.a                     # 3
+        if x:                          # 4
+            self.b = x + y             # 5
+        z = y                          # 6
+        self.c.append(z)               # 7
+        return x                       # 8
+
+# ==========
+
+@pytest.fixture
+def matrix():
+    return UsageMatrix({'x': set([4, 5]), ('self', 'a'): set([3])},
+                       {'x': set([2]), ('self', 'b'): set([5])})
+
+def test_lines(matrix):
+    assert matrix.minlineno == 2
+    assert matrix.maxlineno == 5
+
+    x = matrix.interner.get('x')
+    assert matrix.to_lists(matrix.reads)[x] == [False, False, True, True]
+    assert matrix.to_lists(matrix.writes)[x] == [True, False, False, False]
+
+def test_block_inouts(matrix):
+    assert matrix.block_inouts([(3, 5), (2, 2), (4, 3)]) == [
+        (set(['x', ('self', 'a')]), set([('self', 'b')])),
+        (set(), set(['x'])),
+        (set(), set())]
+
+def test_matches_analyzer():
+    analyzer = Analyzer(Bar.foo)
+    matrix = UsageMatrix.from_summary(analyzer.summary)
+    ranges = [(lo, hi) for lo in range(1, 10) for hi in range(lo, 10)]
+
+    # No helpers are called so the matrix finds every value
+    assert matrix.block_inouts(ranges) == \
+        [analyzer.block_inout(lo, hi) for lo, hi in ranges]
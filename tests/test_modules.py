@@ -0,0 +1,146 @@
+import pytest
+
+import os
+import textwrap
+from sully.__main__ import main
+from sully.modules import ModuleAnalysis, analyze_path, find_modules
+
+SOURCE = textwrap.dedent('''
+    def free(x):
+        y = x
+        return y
+
+    class Bar:
+        def foo(self, n):
+            self.a = n
+            self.helper()
+
+        def helper(self):
+            return self.b
+
+        def even(self, n):
+            self.c = n
+            self.odd(n)
+
+        def odd(self, n):
+            self.even(self.d)
+
+        def broken(self):
+            self.x.y.z = 1
+
+        class Inner:
+            def qux(self):
+                return self.e
+''')
+
+@pytest.fixture
+def package(tmpdir):
+    tmpdir.join('a.py').write(SOURCE)
+    tmpdir.mkdir('sub').join('b.py').write('def baz(q):\n    return q\n')
+    tmpdir.join('bad.py').write('def (:\n')
+    tmpdir.join('null.py').write('x = 1\0\n')
+    tmpdir.join('notes.txt').write('not python')
+    return tmpdir
+
+def test_functions_found():
+    analysis = ModuleAnalysis('a.py', SOURCE)
+    assert list(analysis.linenos) == ['free', 'Bar.foo', 'Bar.helper',
+                                      'Bar.even', 'Bar.odd', 'Bar.broken',
+                                      'Bar.Inner.qux']
+    assert analysis.linenos['Bar.foo'] == 7
+
+DEFINITIONS = textwrap.dedent('''
+    try:
+        from json import loads
+    except ImportError:
+        def loads(s):
+            return s
+
+    class A:
+        @property
+        def x(self):
+            return self._x
+
+        @x.setter
+        def x(self, value):
+            self._x = value
+
+        if True:
+            def y(self):
+                return self.x
+''')
+
+def test_nested_and_duplicate_definitions():
+    analysis = ModuleAnalysis('defs.py', DEFINITIONS)
+    # Decorated definitions start at the decorator on Python 2
+    getter, = [name for name in analysis.linenos
+               if name.startswith('A.x@')]
+    assert getter == 'A.x@%d' % analysis.linenos[getter]
+    assert list(analysis.linenos) == ['loads', getter, 'A.x', 'A.y']
+    assert analysis.linenos['loads'] == 5
+    assert analysis.linenos['A.y'] == 18
+    assert ('self', '_x') in analysis.summaries[getter].read_lines
+    assert ('self', '_x') in analysis.summaries['A.x'].write_lines
+
+def test_file_lines():
+    analysis = ModuleAnalysis('a.py', SOURCE)
+    summary = analysis.summaries['free']
+    assert summary.args == ['x']
+    assert summary.write_lines['y'] == set([3])
+    assert summary.read_lines['y'] == set([4])
+
+def test_helpers():
+    analysis = ModuleAnalysis('a.py', SOURCE)
+    summary = analysis.summaries['Bar.foo']
+    assert summary.write_lines[('self', 'a')] == set([8])
+    assert summary.read_lines[('self', 'b')] == set([9])
+
+def test_recursive_helpers():
+    analysis = ModuleAnalysis('a.py', SOURCE)
+    for name in ('Bar.even', 'Bar.odd'):
+        summary = analysis.summaries[name]
+        assert ('self', 'c') in summary.write_lines
+        assert ('self', 'd') in summary.read_lines
+
+def test_function_error():
+    analysis = ModuleAnalysis('a.py', SOURCE)
+    assert list(analysis.errors) == ['Bar.broken']
+    assert 'Attribute' in str(analysis.errors['Bar.broken'])
+    assert 'Bar.broken' not in analysis.summaries
+    assert 'Bar.Inner.qux' in analysis.summaries
+
+def test_syntax_error():
+    analysis = ModuleAnalysis('bad.py', 'def (:\n')
+    assert isinstance(analysis.error, SyntaxError)
+    assert not analysis.summaries
+
+def test_null_bytes():
+    analysis = ModuleAnalysis('null.py', 'x = 1\0\n')
+    assert analysis.error is not None
+    assert not analysis.summaries
+
+def test_find_modules(package):
+    root = str(package)
+    assert find_modules(root) == [os.path.join(root, 'a.py'),
+                                  os.path.join(root, 'bad.py'),
+                                  os.path.join(root, 'null.py'),
+                                  os.path.join(root, 'sub', 'b.py')]
+
+def test_analyze_path(package):
+    modules = analyze_path(str(package))
+    b = modules[os.path.join(str(package), 'sub', 'b.py')]
+    assert b.summaries['baz'].read_lines['q'] == set([2])
+
+def test_main(package, capsys):
+    assert main([str(package.join('sub'))]) == 0
+    out, _ = capsys.readouterr()
+    assert 'b.py:1: baz' in out
+    assert '  reads: q' in out
+
+    assert main([str(package)]) == 1
+    out, err = capsys.readouterr()
+    assert all(line.startswith(' ') or ': ' in line
+               for line in out.splitlines())
+    assert 'bad.py' in err
+    assert 'null.py' in err
+    assert 'Bar.broken' in err
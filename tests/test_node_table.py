@@ -0,0 +1,78 @@
+import pytest
+
+import ast
+import gc
+from sully import NodeTable, ParentTransformer, TaintAnalysis, \
+                  block_including, get_func_source
+
+# Below are simple objects we use for testing
+# ==========
+
+def foo(z):
+    x = [1, 2, 3]                       # 2
+    for y in x:                         # 3
+        print(y)                        # 4
+        x.append(y + 1)                 # 5
+        break                           # 6
+    return z                            # 7
+
+# ==========
+
+def find_for(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.For):
+            return node
+
+@pytest.fixture
+def tree():
+    return ast.parse(get_func_source(foo))
+
+def test_parent(tree):
+    table = NodeTable(tree)
+    for_node = find_for(tree)
+    assert table.parent(tree) is None
+    assert table.parent(for_node) is tree.body[0]
+    assert table.parent(for_node.iter) is for_node
+
+def test_depth(tree):
+    table = NodeTable(tree)
+    assert table.depth(tree) == 0
+    assert table.depth(find_for(tree)) == 2
+
+def test_ancestors(tree):
+    table = NodeTable(tree)
+    ancestors = list(table.ancestors(find_for(tree).iter))
+    assert isinstance(ancestors[0], ast.For)
+    assert isinstance(ancestors[1], ast.FunctionDef)
+    assert isinstance(ancestors[2], ast.Module)
+
+def test_span(tree):
+    table = NodeTable(tree)
+    assert table.span(find_for(tree)) == (3, 6)
+    assert table.span(tree) == (None, None)
+
+def test_matches_parent_transformer(tree):
+    table = NodeTable(tree)
+    ParentTransformer().visit(tree)
+
+    for node in ast.walk(tree):
+        if node in table:
+            assert table.parent(node) is node.parent
+            assert table.minlineno(node) == getattr(node, 'minlineno', None)
+            assert table.maxlineno(node) == getattr(node, 'maxlineno', None)
+
+def test_block_including(tree):
+    block = block_including(tree, 5, 6, NodeTable(tree))
+    assert len(block) == 1
+    assert isinstance(block[0], ast.For)
+
+def test_analysis_node_table(tree):
+    taint = TaintAnalysis(tree, node_table=True)
+    assert taint.node_table.span(find_for(tree)) == (3, 6)
+    assert not hasattr(find_for(tree), 'parent')
+
+def test_analysis_no_cycles(tree):
+    gc.collect()
+    taint = TaintAnalysis(tree, node_table=True)
+    del taint, tree
+    assert gc.collect() == 0
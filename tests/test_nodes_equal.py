@@ -1,6 +1,6 @@
 import ast
 
-from sully import nodes_equal
+from sully import node_fingerprint, nodes_equal
 
 # Helper function to get the AST from an expression
 def parse_source(source):
@@ -25,3 +25,39 @@ def test_subscript_equal():
 
 def test_subscript_unequal():
     assert not nodes_equal(parse_source('x[0]'), parse_source('x[1]'))
+
+def test_fingerprint_equal():
+    assert node_fingerprint(parse_source('self.x[0] + 1')) == \
+           node_fingerprint(parse_source('self.x[0] + 1'))
+
+def test_fingerprint_unequal():
+    assert node_fingerprint(parse_source('self.x[0] + 1')) != \
+           node_fingerprint(parse_source('self.x[1] + 1'))
+
+def test_fingerprint_stored():
+    node = parse_source('self.x')
+    fingerprint = node_fingerprint(node)
+    assert node.fingerprint == fingerprint
+    assert node.value.fingerprint == node_fingerprint(parse_source('self'))
+
+def test_fingerprint_mismatch():
+    node1 = parse_source('self.x')
+    node2 = parse_source('self.x')
+    node_fingerprint(node1)
+    node2.fingerprint = node1.fingerprint + 1
+    assert not nodes_equal(node1, node2)
+
+def test_operator_unequal():
+    assert not nodes_equal(parse_source('x + y'), parse_source('x - y'))
+
+def test_call_equal():
+    assert nodes_equal(parse_source('foo(x, y=1)'), parse_source('foo(x, y=1)'))
+
+def test_call_unequal():
+    assert not nodes_equal(parse_source('foo(x)'), parse_source('foo(x, y)'))
+
+def test_deep_equal():
+    source = ' + '.join(['x'] * 5000)
+    assert nodes_equal(parse_source(source), parse_source(source))
+    assert not nodes_equal(parse_source(source),
+                           parse_source('y + ' + source[4:]))
@@ -0,0 +1,62 @@
+import pytest
+
+import os
+from sully.__main__ import main
+from sully.parallel import analyze_paths, chunk_by_size
+
+@pytest.fixture
+def package(tmpdir):
+    for i in range(12):
+        body = ''.join('    x%d = n\n' % j for j in range(i + 1))
+        tmpdir.join('m%02d.py' % i).write('def f(n):\n' + body)
+    tmpdir.join('bad.py').write('def (:\n')
+    tmpdir.join('null.py').write('x = 1\0\n')
+    return tmpdir
+
+def test_chunks_balanced(tmpdir):
+    paths = []
+    for i, size in enumerate([100, 90, 50, 40, 10, 10]):
+        path = tmpdir.join('%d.py' % i)
+        path.write('#' * size)
+        paths.append(str(path))
+
+    chunks = chunk_by_size(paths, 3)
+    assert sorted(sum(chunks, [])) == sorted(paths)
+    totals = sorted(sum(os.path.getsize(path) for path in chunk)
+                    for chunk in chunks)
+    assert totals == [100, 100, 100]
+
+def test_chunks_few_files(tmpdir):
+    path = tmpdir.join('a.py')
+    path.write('')
+    assert chunk_by_size([str(path)], 8) == [[str(path)]]
+    assert chunk_by_size([], 8) == []
+
+def test_ordered(package):
+    serial = analyze_paths([str(package)], 1)
+    parallel = analyze_paths([str(package)], 3)
+
+    assert list(parallel) == list(serial)
+    assert list(parallel) == sorted(parallel)
+    for path, analysis in serial.items():
+        other = parallel[path]
+        assert list(other.summaries) == list(analysis.summaries)
+        for name, summary in analysis.summaries.items():
+            assert other.summaries[name] == summary
+        assert type(other.error) == type(analysis.error)
+
+def test_summaries(package):
+    modules = analyze_paths([str(package)], 2)
+    summary = modules[str(package.join('m03.py'))].summaries['f']
+    assert summary.write_lines['x3'] == set([5])
+    assert isinstance(modules[str(package.join('bad.py'))].error,
+                      SyntaxError)
+
+def test_duplicate_paths(package):
+    path = str(package.join('m00.py'))
+    assert list(analyze_paths([path, str(package)], 1)).count(path) == 1
+
+def test_main_jobs(package, capsys):
+    assert main(['-j', '2', str(package.join('m01.py'))]) == 0
+    out, _ = capsys.readouterr()
+    assert 'm01.py:1: f' in out
@@ -0,0 +1,60 @@
+import pytest
+
+import ast
+from sully import TaintAnalysis
+
+# Below are simple objects we use for testing
+# ==========
+
+class Bar:
+    def foo(self, tainted):
+        x = tainted.baz()              # 2
+        self.a = x + 1                 # 3
+        self.b.qux(self.a)             # 4
+        return x                       # 5
+
+# ==========
+
+def test_all_passes():
+    taint = TaintAnalysis(Bar.foo, 'tainted')
+    assert taint.passes == TaintAnalysis.PASSES
+
+def test_unknown_pass():
+    with pytest.raises(ValueError):
+        TaintAnalysis(Bar.foo, 'tainted', passes=['reads', 'colors'])
+
+def test_no_taint_obj():
+    taint = TaintAnalysis(Bar.foo)
+    assert 'taint' not in taint.passes
+    assert 'provenance' not in taint.passes
+
+def test_reads_only():
+    taint = TaintAnalysis(Bar.foo, 'tainted', passes=['reads'])
+    full = TaintAnalysis(Bar.foo, 'tainted')
+
+    assert taint.read_lines == full.read_lines
+    assert not taint.write_lines
+    assert not taint.functions
+    assert not taint.taint_exprs
+
+def test_writes_and_calls():
+    taint = TaintAnalysis(Bar.foo, 'tainted', passes=['writes', 'calls'])
+    full = TaintAnalysis(Bar.foo, 'tainted')
+
+    assert taint.write_lines == full.write_lines
+    assert taint.functions == full.functions
+    assert not taint.read_lines
+    assert not taint.taint_exprs
+
+def test_taint_only():
+    taint = TaintAnalysis(Bar.foo, 'tainted', passes=['taint'])
+    full = TaintAnalysis(Bar.foo, 'tainted')
+
+    assert len(taint.taint_exprs) == len(full.taint_exprs)
+    assert not taint.read_lines
+    assert not taint.write_lines
+
+def test_chained_compare_without_taint():
+    tree = ast.parse('def foo(a):\n    return 1 < a < 3\n')
+    taint = TaintAnalysis(tree, passes=['reads'])
+    assert 'a' in taint.read_lines
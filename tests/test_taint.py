@@ -40,3 +40,48 @@ def test_notaint_var(taint):
 def test_taint_call(taint):
     assert any(isinstance(expr, ast.Call) and expr.lineno == 3
             for expr in taint.taint_exprs)
+
+class NumAnalysis(TaintAnalysis):
+    def record_Num(self, node):
+        self.numbers.append(node.n)
+
+    def record_Name(self, node):
+        super(NumAnalysis, self).record_Name(node)
+        self.names.append(node.id)
+
+    def __init__(self, func):
+        self.numbers = []
+        self.names = []
+        super(NumAnalysis, self).__init__(func)
+
+def test_subclass_dispatch():
+    taint = NumAnalysis(Bar.foo)
+    assert taint.numbers == [3]
+    assert sorted(set(taint.names)) == ['self', 'tainted', 'x']
+    assert taint.read_lines['x'] == set([3, 5])
+
+    # The dispatch table of the parent class is not affected
+    assert not hasattr(TaintAnalysis(Bar.foo), 'numbers')
+
+def test_provenance(taint):
+    call, x = [expr for expr in taint.taint_exprs if expr.lineno == 2 and
+               isinstance(expr, (ast.Call, ast.Name))]
+    if isinstance(call, ast.Name):
+        call, x = x, call
+
+    assert taint.tainted_by[x] == [call]
+    assert taint.tainted_by.path(x) == [call, x]
+    assert taint.tainted_by.path(x, origin=x) is None
+
+def test_provenance_chain():
+    tree = ast.parse('def foo(tainted):\n'
+                     '    y = tainted.bar() + 1 + 2 + 3\n')
+    taint = TaintAnalysis(tree, 'tainted')
+    y = [expr for expr in taint.taint_exprs
+         if isinstance(expr, ast.Name)][0]
+
+    # Each step is stored once rather than copied along the chain
+    assert sum(len(sources)
+               for sources in taint.tainted_by.edges.values()) == 4
+    assert len(taint.tainted_by[y]) == 1
+    assert len(taint.tainted_by.path(y)) == 5
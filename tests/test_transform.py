@@ -1,7 +1,8 @@
 import pytest
 
 import ast
-from sully import TaintAnalysis, block_including, block_inout
+from sully import ParentTransformer, TaintAnalysis, block_including, \
+                  block_inout, get_func_source
 
 # Below are simple objects we use for testing
 # ==========
@@ -46,3 +47,62 @@ def test_block_inout(taint):
     in_exprs, out_exprs = block_inout(taint.func_ast, 3, 7)
     assert in_exprs == set(['x', 'z'])
     assert out_exprs == set([])
+
+def test_deep_parents():
+    tree = ast.parse(' + '.join(['x'] * 20000))
+    ParentTransformer().visit(tree)
+
+    expr = tree.body[0].value
+    while isinstance(expr, ast.BinOp):
+        expr = expr.left
+    assert len(expr.ancestors()) == 20001
+
+def test_parents_match_transformer():
+    source = get_func_source(foo)
+    tree = ast.parse(source)
+    expected = ParentTransformer().visit(ast.parse(source))
+    TaintAnalysis(tree)
+
+    for node, expected_node in zip(ast.walk(tree), ast.walk(expected)):
+        assert node.fingerprint == expected_node.fingerprint
+        for attr in ('minlineno', 'maxlineno'):
+            assert getattr(node, attr, None) == \
+                   getattr(expected_node, attr, None)
+
+        if expected_node.parent is None:
+            assert node.parent is None
+        else:
+            assert node.parent.fingerprint == expected_node.parent.fingerprint
+            assert len(node.ancestors()) == len(expected_node.ancestors())
+
+def test_deep_analysis():
+    tree = ast.parse('y = ' + ' + '.join(['x'] * 20000))
+    taint = TaintAnalysis(tree)
+    assert taint.read_lines['x'] == set([1])
+    assert taint.write_lines['y'] == set([1])
+
+def test_visit_methods_rejected():
+    class Old(TaintAnalysis):
+        def visit_Assign(self, node):
+            pass
+
+    with pytest.raises(TypeError):
+        Old(ast.parse('y = x'))
+
+    # Methods which don't name a type of node are still allowed
+    class Other(TaintAnalysis):
+        def visit_later(self, node):
+            pass
+
+    assert Other(ast.parse('y = x')).read_lines['x'] == set([1])
+
+def test_node_visitor_methods_allowed(monkeypatch):
+    # NodeVisitor defines visit_Constant on Python 3.8+
+    monkeypatch.setattr(ast.NodeVisitor, 'visit_Num',
+                        lambda self, node: None, raising=False)
+
+    class Plain(TaintAnalysis):
+        pass
+
+    taint = Plain(ast.parse('def f(x):\n    y = x\n'))
+    assert taint.read_lines['x'] == set([2])